@@ -12,13 +12,17 @@ USAGE:
   python split_by_ec.py uniprot_export.tsv --ec-col "EC number"
   python split_by_ec.py uniprot_export.tsv --cat-col "Catalytic activity"  # if EC is embedded in text
   python split_by_ec.py uniprot_export.csv --sep ","
+  python split_by_ec.py uniprot_export.tsv --engine pyarrow  # multithreaded reader for big exports
+  python split_by_ec.py uniprot_export.tsv --workers 8       # byte-range shards, one process per core
 """
 
 import argparse
 import re
+from collections import defaultdict
+from functools import partial
 from pathlib import Path
 
-import pandas as pd
+from tsv_engine import add_engine_arg, read_table, write_rows
 
 
 EC_REGEX = re.compile(r"\b\d+\.\d+\.\d+\.(?:\d+|-)\b")
@@ -45,6 +49,39 @@ def sanitize_filename(s: str) -> str:
     return re.sub(r"[^A-Za-z0-9._-]+", "_", s)
 
 
+def row_ec_keys(ec_text: str, mode: str) -> list[str]:
+    """Keys a row is filed under for the given --mode (NO_EC if it has no EC)."""
+    xs = extract_ec_list(ec_text)
+    if not xs:
+        return ["NO_EC"]
+    if mode == "first":
+        return [xs[0]]
+    if mode == "joined":
+        return ["|".join(xs)]
+    return xs  # explode
+
+
+def choose_ec_column(columns: list[str], ec_col: str, cat_col: str) -> int | None:
+    """Index of the EC column, else of the catalytic-activity fallback column, else None."""
+    if ec_col in columns:
+        return columns.index(ec_col)
+    if cat_col in columns:
+        return columns.index(cat_col)
+    return None
+
+
+def classify_row(row: list[str], ec_idx: int | None, mode: str) -> list[str]:
+    """EC keys of one raw row (used by the sharded --workers path)."""
+    return row_ec_keys(row[ec_idx] if ec_idx is not None else "", mode)
+
+
+def format_rows(header: list[str], rows: list[list]) -> str:
+    """Right-aligned plain-text table (like DataFrame.to_string(index=False))."""
+    cells = [header] + [[str(v) for v in r] for r in rows]
+    widths = [max(len(r[i]) for r in cells) for i in range(len(header))]
+    return "\n".join(" ".join(v.rjust(w) for v, w in zip(r, widths)) for r in cells)
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("input_file", help="UniProt export (TSV/CSV)")
@@ -75,61 +112,81 @@ def main():
         default=None,
         help="Output directory (default: alongside input file, in <stem>_ec_split/)",
     )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Split the input into byte-range shards processed by N worker processes (default: 1).",
+    )
+    ap.add_argument(
+        "--tmp-dir",
+        default=None,
+        help="With --workers: directory for the per-shard part files (default: the output directory).",
+    )
+    add_engine_arg(ap)
     args = ap.parse_args()
 
     in_path = Path(args.input_file)
     sep = args.sep if args.sep is not None else guess_sep(in_path)
 
-    df = pd.read_csv(in_path, sep=sep, dtype=str)
-
-    # Choose source column for EC extraction
-    if args.ec_col in df.columns:
-        ec_source = df[args.ec_col].fillna("").astype(str)
-    elif args.cat_col in df.columns:
-        ec_source = df[args.cat_col].fillna("").astype(str)
-    else:
-        # create empty series if nothing exists
-        ec_source = pd.Series([""] * len(df))
-
-    df["EC_list"] = ec_source.map(extract_ec_list)
-
-    # Create grouping key depending on mode
-    if args.mode == "first":
-        df["EC_key"] = df["EC_list"].map(lambda xs: xs[0] if xs else "NO_EC")
-        groups = df.groupby("EC_key", dropna=False)
-    elif args.mode == "joined":
-        df["EC_key"] = df["EC_list"].map(lambda xs: "|".join(xs) if xs else "NO_EC")
-        groups = df.groupby("EC_key", dropna=False)
-    else:  # explode
-        df_ex = df.copy()
-        df_ex["EC_key"] = df_ex["EC_list"]
-        df_ex = df_ex.explode("EC_key")
-        df_ex["EC_key"] = df_ex["EC_key"].fillna("NO_EC")
-        groups = df_ex.groupby("EC_key", dropna=False)
-
     out_dir = Path(args.out_dir) if args.out_dir else in_path.parent / f"{in_path.stem}_ec_split"
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    # Write one file per EC group
+    def out_file_for(ec_key: str) -> Path:
+        return out_dir / f"{in_path.stem}_EC_{sanitize_filename(ec_key)}{in_path.suffix or '.tsv'}"
+
     summary_rows = []
-    for ec_key, g in groups:
-        ec_key_str = str(ec_key)
-        safe = sanitize_filename(ec_key_str)
-        out_file = out_dir / f"{in_path.stem}_EC_{safe}{in_path.suffix or '.tsv'}"
-        g.drop(columns=["EC_list"], errors="ignore").to_csv(out_file, sep=sep, index=False)
-        summary_rows.append({"EC_key": ec_key_str, "rows": len(g), "file": out_file.name})
-
-    summary = pd.DataFrame(summary_rows).sort_values(["rows", "EC_key"], ascending=[False, True])
+    if args.workers > 1:
+        from sharded import read_header, split_sharded
+
+        columns = read_header(in_path, sep)
+        ec_idx = choose_ec_column(columns, args.ec_col, args.cat_col)
+        _, counts, out_files, n_input = split_sharded(
+            in_path,
+            sep,
+            partial(classify_row, ec_idx=ec_idx, mode=args.mode),
+            "EC_key",
+            out_file_for,
+            args.workers,
+            work_dir=Path(args.tmp_dir) if args.tmp_dir else out_dir,
+        )
+        for ec_key in sorted(counts):
+            summary_rows.append([ec_key, counts[ec_key], out_files[ec_key].name])
+    else:
+        df = read_table(in_path, sep=sep, engine=args.engine)
+        n_input = len(df)
+
+        # Choose source column for EC extraction
+        ec_idx = choose_ec_column(df.columns, args.ec_col, args.cat_col)
+        # empty values if nothing exists
+        ec_source = df[df.columns[ec_idx]] if ec_idx is not None else [""] * len(df)
+
+        # Grouping key depending on mode (key -> row indices, in input order)
+        groups: dict[str, list[int]] = defaultdict(list)
+        for i, s in enumerate(ec_source):
+            for k in row_ec_keys(s, args.mode):
+                groups[k].append(i)
+
+        # Write one file per EC group
+        for ec_key in sorted(groups):
+            idx = groups[ec_key]
+            g = df.take(idx)
+            g["EC_key"] = [ec_key] * len(idx)
+            out_file = out_file_for(ec_key)
+            g.write(out_file, sep=sep)
+            summary_rows.append([ec_key, len(idx), out_file.name])
+
+    summary_rows.sort(key=lambda r: (-r[1], r[0]))
     summary_file = out_dir / f"{in_path.stem}_EC_summary.tsv"
-    summary.to_csv(summary_file, sep="\t", index=False)
+    write_rows(summary_file, ["EC_key", "rows", "file"], summary_rows, sep="\t")
 
-    print(f"Input rows: {len(df)}")
+    print(f"Input rows: {n_input}")
     if args.mode == "explode":
-        print(f"Exploded rows (proteins with multiple EC counted multiple times): {sum(r['rows'] for r in summary_rows)}")
+        print(f"Exploded rows (proteins with multiple EC counted multiple times): {sum(r[1] for r in summary_rows)}")
     print(f"Output directory: {out_dir}")
     print(f"Summary written: {summary_file}")
     print("Top 10 EC groups:")
-    print(summary.head(10).to_string(index=False))
+    print(format_rows(["EC_key", "rows", "file"], summary_rows[:10]))
 
 
 if __name__ == "__main__":
@@ -17,13 +17,15 @@ Run:
 Optional:
   python assign_groups_to_ec_summary.py MT_grouped.tsv MT2_EC_summary.tsv \
     --ec-col EC_key --out-summary MT2_EC_summary_with_groups.tsv --out-totals MT2_group_totals.tsv
+  python assign_groups_to_ec_summary.py MT_grouped.tsv MT2_EC_summary.tsv --engine stdlib
 """
 
 import argparse
 import re
+from collections import defaultdict
 from pathlib import Path
 
-import pandas as pd
+from tsv_engine import add_engine_arg, read_table, write_rows
 
 
 EC_REGEX = re.compile(r"\b\d+\.\d+\.\d+\.(?:\d+|-)\b")
@@ -111,6 +113,19 @@ def choose_group_for_ecs(ecs: list[str], ec_to_group: dict[str, str]) -> str:
     return "MULTIPLE"
 
 
+def to_int(s: str) -> int:
+    """Numeric-ish count -> int (like pd.to_numeric(errors="coerce").fillna(0).astype(int))."""
+    try:
+        return int(s)
+    except ValueError:
+        pass
+    try:
+        f = float(s)
+    except ValueError:
+        return 0
+    return int(f) if f == f and abs(f) != float("inf") else 0
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("mt_grouped_tsv", help="MT_grouped.tsv (with # O_MT blocks)")
@@ -136,6 +151,7 @@ def main():
         default=None,
         help="Output TSV with totals per group (default: <summary_stem>_group_totals.tsv)",
     )
+    add_engine_arg(ap)
     args = ap.parse_args()
 
     mt_path = Path(args.mt_grouped_tsv)
@@ -148,51 +164,49 @@ def main():
             "Check that it contains lines like '# O_MT (...)' and then EC numbers in the first column."
         )
 
-    df = pd.read_csv(summary_path, sep="\t", dtype=str)
+    df = read_table(summary_path, sep="\t", engine=args.engine)
 
-    if args.ec_col not in df.columns:
+    if args.ec_col not in df:
         raise RuntimeError(
             f"Column '{args.ec_col}' not found in {summary_path.name}. "
-            f"Available columns: {list(df.columns)}"
+            f"Available columns: {df.columns}"
         )
 
     # Extract ECs from the EC column (handles '2.1.1.1', 'EC:2.1.1.1|2.1.1.2', etc.)
-    df["_ecs"] = df[args.ec_col].fillna("").astype(str).apply(lambda s: EC_REGEX.findall(s))
-    df["MT_group"] = df["_ecs"].apply(lambda ecs: choose_group_for_ecs(ecs, ec_to_group))
+    ec_values = df[args.ec_col]
+    df["MT_group"] = [choose_group_for_ecs(EC_REGEX.findall(s), ec_to_group) for s in ec_values]
 
     # Output 1: annotated summary
     out_summary = Path(args.out_summary) if args.out_summary else summary_path.with_name(f"{summary_path.stem}_with_groups.tsv")
-    df.drop(columns=["_ecs"], errors="ignore").to_csv(out_summary, sep="\t", index=False)
+    df.write(out_summary, sep="\t")
 
     # Output 2: totals per group
     # If count column exists and is numeric-ish -> sum it; otherwise just count rows
-    if args.count_col in df.columns:
-        counts = pd.to_numeric(df[args.count_col], errors="coerce")
-        df["_count_num"] = counts.fillna(0).astype(int)
-        totals = (
-            df.groupby("MT_group", dropna=False)
-              .agg(
-                  total_rows_in_summary=("MT_group", "size"),
-                  total_count=( "_count_num", "sum"),
-                  distinct_ec_keys=(args.ec_col, pd.Series.nunique),
-              )
-              .reset_index()
-              .sort_values(["total_count", "total_rows_in_summary"], ascending=False)
-        )
-        df.drop(columns=["_count_num"], inplace=True, errors="ignore")
+    has_counts = args.count_col in df
+    counts = [to_int(v) for v in df[args.count_col]] if has_counts else None
+
+    rows_per_group: dict[str, int] = defaultdict(int)
+    count_per_group: dict[str, int] = defaultdict(int)
+    keys_per_group: dict[str, set] = defaultdict(set)
+    for i, g in enumerate(df["MT_group"]):
+        rows_per_group[g] += 1
+        if ec_values[i]:
+            keys_per_group[g].add(ec_values[i])
+        if has_counts:
+            count_per_group[g] += counts[i]
+
+    groups = sorted(rows_per_group)
+    if has_counts:
+        header = ["MT_group", "total_rows_in_summary", "total_count", "distinct_ec_keys"]
+        totals = [[g, rows_per_group[g], count_per_group[g], len(keys_per_group[g])] for g in groups]
+        totals.sort(key=lambda r: (-r[2], -r[1]))
     else:
-        totals = (
-            df.groupby("MT_group", dropna=False)
-              .agg(
-                  total_rows_in_summary=("MT_group", "size"),
-                  distinct_ec_keys=(args.ec_col, pd.Series.nunique),
-              )
-              .reset_index()
-              .sort_values(["total_rows_in_summary"], ascending=False)
-        )
+        header = ["MT_group", "total_rows_in_summary", "distinct_ec_keys"]
+        totals = [[g, rows_per_group[g], len(keys_per_group[g])] for g in groups]
+        totals.sort(key=lambda r: -r[1])
 
     out_totals = Path(args.out_totals) if args.out_totals else summary_path.with_name(f"{summary_path.stem}_group_totals.tsv")
-    totals.to_csv(out_totals, sep="\t", index=False)
+    write_rows(out_totals, header, totals, sep="\t")
 
     print(f"Loaded EC->group mappings: {len(ec_to_group)}")
     print(f"Wrote: {out_summary}")
@@ -14,13 +14,20 @@ Run:
   python count_unique_entry_bases.py O_MT.tsv N_MT.tsv C_MT.tsv
 
 If your column is not called "Entry name", use --col.
+
+Per-clade counts (needs a local NCBI taxdump, see taxonomy.py):
+  python count_unique_entry_bases.py MT2_by_group/*.tsv --taxdump /data/taxdump --rank kingdom
+
+Base name x file / MT_group / EC membership matrix (queries: see membership.py):
+  python count_unique_entry_bases.py MT2_by_group/*.tsv --matrix MT2_bases.npz
+  python count_unique_entry_bases.py MT2.tsv --matrix MT2_bases_by_ec.npz --columns ec
 """
 
 import argparse
 from pathlib import Path
-from collections import Counter
+from collections import Counter, defaultdict
 
-import pandas as pd
+from tsv_engine import add_engine_arg, read_table
 
 
 def base_name(entry: str) -> str:
@@ -31,6 +38,12 @@ def base_name(entry: str) -> str:
     return entry.split("_", 1)[0]
 
 
+def print_clades(level: str, clade_rows: Counter, clade_bases: dict) -> None:
+    print(f"Per {level} (rows / unique base names):")
+    for clade, n in clade_rows.most_common():
+        print(f"  {clade}\t{n}\t{len(clade_bases.get(clade, ()))}")
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("files", nargs="+", help="TSV files to analyze")
@@ -45,24 +58,90 @@ def main():
         default=15,
         help="Show top N most frequent base names per file and overall (default: 15). Use 0 to skip.",
     )
+    ap.add_argument(
+        "--matrix",
+        default=None,
+        help="Also save a sparse base name x column membership matrix (.npz, see membership.py)",
+    )
+    ap.add_argument(
+        "--columns",
+        choices=["file", "group", "ec"],
+        default="file",
+        help="Matrix columns: input files, MT_group values or ECs (default: file)",
+    )
+    ap.add_argument("--group-col", default="MT_group", help='Group column for --columns group (default: "MT_group")')
+    ap.add_argument("--ec-col", default="EC number", help='EC column for --columns ec (default: "EC number")')
+    ap.add_argument(
+        "--taxdump",
+        default=None,
+        help="Directory with NCBI nodes.dmp / names.dmp (enables clade rollups, see taxonomy.py)",
+    )
+    ap.add_argument("--rank", default="kingdom", help='Rank to roll up to with --taxdump (default: "kingdom")')
+    ap.add_argument(
+        "--clade",
+        action="append",
+        default=None,
+        help="Instead of --rank: use these clades (name or taxid; repeatable)",
+    )
+    ap.add_argument("--taxid-col", default="Organism (ID)", help='Taxid column (default: "Organism (ID)")')
+    add_engine_arg(ap)
     args = ap.parse_args()
 
+    builder = None
+    if args.matrix:
+        from membership import MembershipBuilder, column_labels
+
+        builder = MembershipBuilder()
+        if args.columns == "file":
+            # file columns are labelled by the path as given; the same file twice would merge silently
+            resolved = [Path(f).resolve() for f in args.files]
+            dups = sorted({f for f, r in zip(args.files, resolved) if resolved.count(r) > 1})
+            if dups:
+                raise SystemExit(f"ERROR: the same file is given more than once: {', '.join(dups)}")
+
+    tax = None
+    if args.taxdump:
+        from taxonomy import check_clades, clade_labels, load_taxonomy
+
+        tax = load_taxonomy(Path(args.taxdump))
+        try:
+            check_clades(tax, args.rank, args.clade)
+        except RuntimeError as e:
+            raise SystemExit(f"ERROR: {e}")
+    level = args.rank if not args.clade else "clade"
+
     overall_full = set()
     overall_base = set()
     overall_base_counts = Counter()
+    overall_clade_rows = Counter()
+    overall_clade_bases = defaultdict(set)
 
     for f in args.files:
         path = Path(f)
-        df = pd.read_csv(path, sep="\t", dtype=str)
-
-        if args.col not in df.columns:
-            raise SystemExit(f"ERROR: Column '{args.col}' not found in {path.name}. Columns: {list(df.columns)}")
-
-        entries = df[args.col].fillna("").astype(str).str.strip()
-        entries = entries[entries != ""]  # drop empty
-
-        full_set = set(entries.tolist())
-        bases = [base_name(x) for x in entries.tolist() if base_name(x)]
+        df = read_table(path, sep="\t", engine=args.engine)
+
+        if args.col not in df:
+            raise SystemExit(f"ERROR: Column '{args.col}' not found in {path.name}. Columns: {df.columns}")
+
+        entries = [x.strip() for x in df[args.col]]
+        if builder is not None:
+            m_bases, m_cols = [], []
+            labels = column_labels(df, args.columns, f, args.group_col, args.ec_col)
+            for x, cols in zip(entries, labels):
+                b = base_name(x)
+                if b:
+                    m_bases.extend([b] * len(cols))
+                    m_cols.extend(cols)
+            builder.add(m_bases, m_cols)
+        if tax is not None:
+            if args.taxid_col not in df:
+                raise SystemExit(f"ERROR: Column '{args.taxid_col}' not found in {path.name}. Columns: {df.columns}")
+            clades = clade_labels(tax, df[args.taxid_col], args.rank, args.clade)
+            clades = [c for x, c in zip(entries, clades) if x != ""]
+        entries = [x for x in entries if x != ""]  # drop empty
+
+        full_set = set(entries)
+        bases = [base_name(x) for x in entries if base_name(x)]
         base_set = set(bases)
         base_counts = Counter(bases)
 
@@ -80,6 +159,17 @@ def main():
             for name, cnt in base_counts.most_common(args.top):
                 print(f"  {name}\t{cnt}")
 
+        if tax is not None:
+            clade_rows = Counter(clades)
+            clade_bases = defaultdict(set)
+            for x, c in zip(entries, clades):
+                if base_name(x):
+                    clade_bases[c].add(base_name(x))
+            overall_clade_rows.update(clade_rows)
+            for c, bs in clade_bases.items():
+                overall_clade_bases[c] |= bs
+            print_clades(level, clade_rows, clade_bases)
+
     print("\n== OVERALL (across all files) ==")
     print(f"Unique full entry names:      {len(overall_full)}")
     print(f"Unique base names (before _): {len(overall_base)}")
@@ -89,6 +179,17 @@ def main():
         for name, cnt in overall_base_counts.most_common(args.top):
             print(f"  {name}\t{cnt}")
 
+    if tax is not None:
+        print_clades(level, overall_clade_rows, overall_clade_bases)
+
+    if builder is not None:
+        matrix = builder.build()
+        matrix.save(Path(args.matrix))
+        shared = len(matrix.shared_rows(2))
+        print(f"\nMembership matrix: {matrix.shape[0]} base names x {matrix.shape[1]} {args.columns} columns, "
+              f"{matrix.nnz} non-zero; {shared} base names in 2+ columns")
+        print(f"Wrote: {Path(args.matrix).resolve()}")
+
 
 if __name__ == "__main__":
     main()
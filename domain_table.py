@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Parse the UniProt "Domain [FT]" column into a compact columnar domain table.
+
+The column holds strings like:
+  DOMAIN 741..873; /note="BAH 1"; /evidence="ECO:0000255|PROSITE-ProRule:PRU00370"; DOMAIN 910..1049; ...
+
+Every DOMAIN feature becomes one row of the table:
+  - row       : int32, index of the entry (row of the input TSV)
+  - start/end : int32, domain boundaries (-1 if unknown, e.g. "?..120")
+  - note      : int32, interned /note= ID (-1 if absent)
+  - evidence  : int32, interned /evidence= ID (-1 if absent)
+plus one int16 "row_group" per entry (index into the group names, -1 if no MT_group column).
+
+The table is saved as a directory of .npy arrays + meta.json (entries, notes, evidence, groups),
+so loading is zero-copy (np.load(..., mmap_mode="r")).
+
+Run:
+  python domain_table.py build MT2_C_MT.tsv
+  python domain_table.py build MT2.tsv --group-col MT_group --out MT2_domains
+  python domain_table.py stats MT2_C_MT_domains --note "SAM-dependent MTase C5-type"
+  python domain_table.py stats MT2_domains --contains BAH
+
+split_mt2_by_group.py can build the table as an optional stage (--domain-table).
+"""
+
+import argparse
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+
+from tsv_engine import add_engine_arg, read_table
+
+
+DOMAIN_COL = "Domain [FT]"
+
+# One DOMAIN feature, optionally followed by its /note= and /evidence= qualifiers.
+# Positions may carry UniProt uncertainty markers ("<1", ">120", "?").
+# No part of a match can cross VALUE_SEP (\s and [^"\x00] exclude it), so it stays within one entry.
+VALUE_SEP = "\x00"
+DOMAIN_REGEX = re.compile(
+    r'DOMAIN\s+[<>]?(\d+|\?)\.\.[<>]?(\d+|\?)'
+    r'(?:;\s*/note="([^"\x00]*)")?'
+    r'(?:;\s*/evidence="([^"\x00]*)")?'
+)
+
+ARRAY_NAMES = ["row", "start", "end", "note", "evidence", "row_group"]
+
+
+class DomainTable:
+    """Columnar domain table (arrays are plain numpy arrays or read-only memmaps)."""
+
+    def __init__(self, row, start, end, note, evidence, row_group,
+                 entries: list[str], notes: list[str], evidence_vocab: list[str], groups: list[str]):
+        self.row = row
+        self.start = start
+        self.end = end
+        self.note = note
+        self.evidence = evidence
+        self.row_group = row_group
+        self.entries = entries
+        self.notes = notes
+        self.evidence_vocab = evidence_vocab
+        self.groups = groups
+
+    def __len__(self) -> int:
+        return len(self.row)
+
+    @property
+    def n_entries(self) -> int:
+        return len(self.row_group)
+
+    def note_ids(self, note: str | None = None, contains: str | None = None) -> np.ndarray:
+        """IDs of notes equal to `note` and/or containing `contains` (case-insensitive)."""
+        ids = []
+        low = contains.lower() if contains else None
+        for i, n in enumerate(self.notes):
+            if note is not None and n != note:
+                continue
+            if low is not None and low not in n.lower():
+                continue
+            ids.append(i)
+        return np.asarray(ids, dtype=np.int32)
+
+    def rows_with_note(self, note_ids: np.ndarray) -> np.ndarray:
+        """Sorted unique entry rows carrying at least one domain with one of the given note IDs."""
+        mask = np.isin(self.note, note_ids)
+        return np.unique(self.row[mask])
+
+    def group_fractions(self, note_ids: np.ndarray) -> list[dict]:
+        """Per group: entries with the domain, total entries, fraction."""
+        n_groups = max(len(self.groups), 1)
+        # shift by 1 so that "no group" (-1) lands in bin 0
+        rg = np.asarray(self.row_group, dtype=np.int64) + 1
+        totals = np.bincount(rg, minlength=n_groups + 1)
+        hits = np.bincount(rg[self.rows_with_note(note_ids)], minlength=n_groups + 1)
+
+        names = ["(all)"] if not self.groups else ["(none)"] + self.groups
+        out = []
+        for i, name in enumerate(names):
+            if not self.groups:
+                i_tot, i_hit = int(totals.sum()), int(hits.sum())
+            else:
+                i_tot, i_hit = int(totals[i]), int(hits[i])
+            if i_tot == 0:
+                continue
+            out.append({"MT_group": name, "with_domain": i_hit, "entries": i_tot, "fraction": i_hit / i_tot})
+        return out
+
+
+def _intern(values: list, vocab: dict[str, int]) -> np.ndarray:
+    out = np.empty(len(values), dtype=np.int32)
+    for i, v in enumerate(values):
+        if v is None:
+            out[i] = -1
+        else:
+            out[i] = vocab.setdefault(v, len(vocab))
+    return out
+
+
+def _pos_array(values: list[str]) -> np.ndarray:
+    return np.array([int(v) if v != "?" else -1 for v in values], dtype=np.int32)
+
+
+def parse_domain_column(domain_values, entries=None, groups=None) -> DomainTable:
+    """
+    Parse a sequence of "Domain [FT]" strings (one per entry) in one batch.
+
+    All values are joined into one buffer and scanned by a single finditer; matches
+    are mapped back to their entry row with a searchsorted over the value offsets.
+    `groups` (optional) is a per-entry group label sequence (e.g. the MT_group column).
+    """
+    values = ["" if not isinstance(v, str) else v.replace(VALUE_SEP, " ") for v in domain_values]
+    n = len(values)
+
+    # values may hold newlines (quoted multi-line fields), so they are joined with a separator
+    # that can't occur in them; an unbalanced /note=" then can't swallow the next entry's domains
+    buf = VALUE_SEP.join(values)
+    lengths = np.fromiter((len(v) + 1 for v in values), dtype=np.int64, count=n)
+    offsets = np.cumsum(lengths) - lengths
+
+    pos, starts, ends, notes, evid = [], [], [], [], []
+    for m in DOMAIN_REGEX.finditer(buf):
+        pos.append(m.start())
+        starts.append(m.group(1))
+        ends.append(m.group(2))
+        notes.append(m.group(3))
+        evid.append(m.group(4))
+
+    row = (np.searchsorted(offsets, np.asarray(pos, dtype=np.int64), side="right") - 1).astype(np.int32)
+
+    note_vocab: dict[str, int] = {}
+    evid_vocab: dict[str, int] = {}
+    note_ids = _intern(notes, note_vocab)
+    evid_ids = _intern(evid, evid_vocab)
+
+    if groups is not None:
+        group_labels = ["" if not isinstance(g, str) else g for g in groups]
+        group_names = sorted({g for g in group_labels if g})
+        gidx = {g: i for i, g in enumerate(group_names)}
+        row_group = np.array([gidx.get(g, -1) for g in group_labels], dtype=np.int16)
+    else:
+        group_names = []
+        row_group = np.full(n, -1, dtype=np.int16)
+
+    return DomainTable(
+        row=row,
+        start=_pos_array(starts),
+        end=_pos_array(ends),
+        note=note_ids,
+        evidence=evid_ids,
+        row_group=row_group,
+        entries=[str(e) for e in entries] if entries is not None else [],
+        notes=list(note_vocab),
+        evidence_vocab=list(evid_vocab),
+        groups=group_names,
+    )
+
+
+def save_domain_table(table: DomainTable, out_dir: Path) -> None:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name in ARRAY_NAMES:
+        np.save(out_dir / f"{name}.npy", np.ascontiguousarray(getattr(table, name)))
+    meta = {
+        "entries": table.entries,
+        "notes": table.notes,
+        "evidence": table.evidence_vocab,
+        "groups": table.groups,
+    }
+    (out_dir / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+
+def load_domain_table(path: Path, mmap: bool = True) -> DomainTable:
+    """Load a saved table; arrays are memory-mapped (zero-copy) unless mmap=False."""
+    mode = "r" if mmap else None
+    arrays = {name: np.load(path / f"{name}.npy", mmap_mode=mode) for name in ARRAY_NAMES}
+    meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    return DomainTable(
+        **arrays,
+        entries=meta["entries"],
+        notes=meta["notes"],
+        evidence_vocab=meta["evidence"],
+        groups=meta["groups"],
+    )
+
+
+def build_from_table(df, domain_col: str = DOMAIN_COL, entry_col: str = "Entry",
+                     group_col: str | None = "MT_group") -> DomainTable:
+    """Build a DomainTable from an already loaded MT2-style table (tsv_engine.Table)."""
+    if domain_col not in df:
+        raise RuntimeError(f"Column '{domain_col}' not found. Available columns: {df.columns}")
+    entries = df[entry_col] if entry_col in df else None
+    groups = df[group_col] if group_col and group_col in df else None
+    return parse_domain_column(df[domain_col], entries=entries, groups=groups)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="Parse a TSV's Domain [FT] column into a domain table")
+    b.add_argument("tsv", help="UniProt export / MT2 split (TSV)")
+    b.add_argument("--domain-col", default=DOMAIN_COL, help=f'Domain column (default: "{DOMAIN_COL}")')
+    b.add_argument("--entry-col", default="Entry", help='Accession column (default: "Entry")')
+    b.add_argument("--group-col", default="MT_group", help='Group column, used if present (default: "MT_group")')
+    b.add_argument("--out", default=None, help="Output directory (default: <stem>_domains/ next to input)")
+    add_engine_arg(b)
+
+    s = sub.add_parser("stats", help="Per-group fraction of entries carrying a domain")
+    s.add_argument("table_dir", help="Directory written by 'build'")
+    s.add_argument("--note", default=None, help='Exact domain note, e.g. "SAM-dependent MTase C5-type"')
+    s.add_argument("--contains", default=None, help="Case-insensitive substring of the domain note")
+    s.add_argument("--top", type=int, default=0, help="Instead of a fraction, list the N most common notes")
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        in_path = Path(args.tsv)
+        df = read_table(in_path, sep="\t", engine=args.engine)
+        table = build_from_table(df, args.domain_col, args.entry_col, args.group_col)
+        out_dir = Path(args.out) if args.out else in_path.parent / f"{in_path.stem}_domains"
+        save_domain_table(table, out_dir)
+        print(f"Input rows: {table.n_entries}")
+        print(f"Domains parsed: {len(table)} ({len(table.notes)} distinct notes)")
+        print(f"Wrote domain table: {out_dir.resolve()}")
+        return
+
+    table = load_domain_table(Path(args.table_dir))
+
+    if args.top:
+        counts = np.bincount(table.note[table.note >= 0], minlength=len(table.notes))
+        for i in np.argsort(-counts, kind="stable")[: args.top]:
+            print(f"  {table.notes[i]}\t{counts[i]}")
+        return
+
+    if args.note is None and args.contains is None:
+        raise SystemExit("ERROR: give --note, --contains or --top")
+    ids = table.note_ids(args.note, args.contains)
+    if len(ids) == 0:
+        raise SystemExit("ERROR: no domain note matches the query")
+
+    print("MT_group\twith_domain\tentries\tfraction")
+    for r in table.group_fractions(ids):
+        print(f"{r['MT_group']}\t{r['with_domain']}\t{r['entries']}\t{r['fraction']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Write a UniProt export sorted by numeric EC (then accession), for exports larger than memory,
+and read EC ranges back from it with one sequential scan.
+
+- Rows are sorted with a bounded-memory external merge sort: at most --max-rows rows are held
+  at once, each sorted chunk is spilled to a temporary run file, and the runs are k-way merged.
+  At most MERGE_FAN_IN runs are open at once: with more runs, groups of them are first merged
+  into longer intermediate runs, so open file handles stay bounded too.
+- EC order is numeric (ec_to_type.ec_sort_key): 2.1.1.9 < 2.1.1.37, and a partial EC such as
+  2.1.1.- sorts right before 2.1.1.1, at the head of its subtree. Rows without EC come last.
+- An "EC_key" column is appended (the sort EC, "NO_EC" if none).
+- A sparse range index (<out>.ecidx: one line per --index-every rows, with the EC key and byte
+  offset) lets a range query seek to the right block and stop as soon as the range is passed.
+
+Rows with several ECs:
+  --mode first   : sorted under their lowest full EC, or their lowest partial EC if they have no
+                   full one (default; range queries see only that EC)
+  --mode explode : one copy per EC, so range queries find every row carrying an EC in the range
+
+Run:
+  python ec_sort.py sort MT2.tsv
+  python ec_sort.py sort MT2.tsv --mode explode --max-rows 50000 --out MT2_ec_sorted.tsv
+  python ec_sort.py range MT2_ec_sorted.tsv 2.1.1.37 2.1.1.80
+  python ec_sort.py range MT2_ec_sorted.tsv 2.1.1.- --out MT2_2.1.1.tsv
+"""
+
+import argparse
+import bisect
+import csv
+import heapq
+import io
+import mmap
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+from ec_to_type import ec_sort_key
+from row_index import iter_records, split_record
+
+
+# Unlike EC_REGEX in the split scripts, also matches partial ECs ("2.1.1.-", "2.1.-.-"):
+# a trailing "-" has no word boundary after it, so \b can't close the match.
+EC_REGEX = re.compile(r"\b\d+\.(?:\d+|-)\.(?:\d+|-)\.(?:\d+|-)(?![\w.-])")
+QUERY_EC_REGEX = re.compile(r"\d+\.(?:\d+|-)\.(?:\d+|-)\.(?:\d+|-)")
+
+NO_EC = "NO_EC"
+NO_EC_KEY = (10**9,) * 4
+MAX_KEY = 10**9 - 1
+MERGE_FAN_IN = 64
+
+
+def ec_key(ec: str) -> tuple:
+    return NO_EC_KEY if ec == NO_EC else tuple(ec_sort_key(ec))
+
+
+def ec_range(lo: str, hi: str | None = None) -> tuple[tuple, tuple]:
+    """
+    Inclusive key range for a query. A partial EC alone ("2.1.1.-", "2.1.-.-") means its whole subtree;
+    as a bound, a partial hi EC also includes its subtree.
+    """
+    def bounds(ec: str) -> tuple[tuple, tuple]:
+        if not QUERY_EC_REGEX.fullmatch(ec):
+            raise ValueError(f"Not an EC number: '{ec}' (expected four fields, e.g. 2.1.1.37 or 2.1.1.-)")
+        parts = ec.split(".")
+        low = ec_key(ec)
+        if "-" not in parts:
+            return low, low
+        first = parts.index("-")
+        high = tuple(low[:first]) + (MAX_KEY,) * (len(low) - first)
+        return low, high
+
+    lo_lo, lo_hi = bounds(lo)
+    if hi is None:
+        return lo_lo, lo_hi
+    return lo_lo, bounds(hi)[1]
+
+
+def row_sort_keys(ec_text: str, mode: str) -> list[tuple[tuple, str]]:
+    """(numeric key, EC_key) pairs a row is sorted under."""
+    ecs = sorted(set(EC_REGEX.findall(ec_text)), key=ec_sort_key)
+    if not ecs:
+        return [(NO_EC_KEY, NO_EC)]
+    if mode == "first":
+        # a specific EC wins over a partial one (2.1.1.- would otherwise sort first)
+        full = [ec for ec in ecs if "-" not in ec]
+        ecs = (full or ecs)[:1]
+    return [(ec_key(ec), ec) for ec in ecs]
+
+
+def _write_run(rows: list, tmp_dir: str) -> str:
+    """Sort one chunk in memory and spill it; each run line is e1..e4, accession, EC_key, row fields."""
+    rows.sort(key=lambda r: (r[0], r[1]))
+    fd, path = tempfile.mkstemp(suffix=".run.tsv", dir=tmp_dir)
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as fh:
+        w = csv.writer(fh, delimiter="\t", lineterminator="\n")
+        for key, acc, ec, fields in rows:
+            w.writerow([*key, acc, ec, *fields])
+    return path
+
+
+def _read_run(path: str):
+    with open(path, "r", encoding="utf-8", newline="") as fh:
+        for rec in csv.reader(fh, delimiter="\t"):
+            yield (tuple(int(x) for x in rec[:4]), rec[4]), rec[5:]
+
+
+def _merge_runs(runs: list[str], tmp_dir: str, fan_in: int = MERGE_FAN_IN) -> list[str]:
+    """Merge groups of fan_in runs into longer runs (deleting the inputs) until at most fan_in are left."""
+    while len(runs) > fan_in:
+        merged = []
+        for k in range(0, len(runs), fan_in):
+            group = runs[k:k + fan_in]
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            fd, path = tempfile.mkstemp(suffix=".run.tsv", dir=tmp_dir)
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as fh:
+                w = csv.writer(fh, delimiter="\t", lineterminator="\n")
+                for (key, acc), fields in heapq.merge(*(_read_run(p) for p in group), key=lambda r: r[0]):
+                    w.writerow([*key, acc, *fields])
+            for p in group:
+                os.remove(p)
+            merged.append(path)
+        runs = merged
+    return runs
+
+
+def external_sort(in_path: Path, out_path: Path, ec_col: str = "EC number", cat_col: str = "Catalytic activity",
+                  entry_col: str = "Entry", mode: str = "first", max_rows: int = 100_000,
+                  index_every: int = 256, tmp_dir: str | None = None) -> tuple[int, int]:
+    """Sort in_path into out_path and write the sparse index. Returns (rows written, runs spilled)."""
+    csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+    runs: list[str] = []
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as work:
+        with open(in_path, "r", encoding="utf-8", errors="replace", newline="") as fh:
+            reader = csv.reader(fh, delimiter="\t")
+            header = next(reader, [])
+            if ec_col in header:
+                ec_i = header.index(ec_col)
+            elif cat_col in header:
+                ec_i = header.index(cat_col)
+            else:
+                ec_i = None
+            acc_i = header.index(entry_col) if entry_col in header else None
+
+            chunk = []
+            for rec in reader:
+                if not rec:
+                    continue
+                if len(rec) < len(header):
+                    rec = rec + [""] * (len(header) - len(rec))
+                ec_text = rec[ec_i] if ec_i is not None else ""
+                acc = rec[acc_i] if acc_i is not None else ""
+                for key, ec in row_sort_keys(ec_text, mode):
+                    chunk.append((key, acc, ec, rec))
+                if len(chunk) >= max_rows:
+                    runs.append(_write_run(chunk, work))
+                    chunk = []
+            if chunk or not runs:
+                runs.append(_write_run(chunk, work))
+
+        written = 0
+        idx_path = index_path_for(out_path)
+        with open(out_path, "wb") as out, open(idx_path, "w", encoding="utf-8", newline="") as idx:
+            idx.write("ec_key\toffset\trow\n")
+            buf = io.StringIO()
+            w = csv.writer(buf, delimiter="\t", lineterminator=os.linesep)
+            w.writerow(header + ["EC_key"])
+            out.write(buf.getvalue().encode("utf-8"))
+
+            merged = [_read_run(p) for p in _merge_runs(runs, work)]
+            for (key, _acc), fields in heapq.merge(*merged, key=lambda r: r[0]):
+                if written % index_every == 0:
+                    idx.write(f"{'.'.join(map(str, key))}\t{out.tell()}\t{written}\n")
+                buf.seek(0)
+                buf.truncate()
+                ec, row = fields[0], fields[1:]
+                w.writerow(row + [ec])
+                out.write(buf.getvalue().encode("utf-8"))
+                written += 1
+    return written, len(runs)
+
+
+def index_path_for(sorted_path: Path) -> Path:
+    return sorted_path.with_name(sorted_path.name + ".ecidx")
+
+
+def load_sparse_index(sorted_path: Path) -> list[tuple[tuple, int]]:
+    out = []
+    lines = index_path_for(sorted_path).read_text(encoding="utf-8").splitlines()[1:]
+    for line in lines:
+        key, offset, _row = line.split("\t")
+        out.append((tuple(int(x) for x in key.split(".")), int(offset)))
+    return out
+
+
+def read_range(sorted_path: Path, lo: tuple, hi: tuple):
+    """
+    Yield raw records (bytes, including line end) of the sorted file with lo <= EC key <= hi.
+
+    Seeks to the last index block starting before lo, then scans forward once and stops after hi.
+    """
+    index = load_sparse_index(sorted_path)
+    keys = [k for k, _ in index]
+    b = bisect.bisect_left(keys, lo) - 1
+    with open(sorted_path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        h_off, h_len = next(iter_records(mm))
+        header = split_record(mm[h_off:h_off + h_len])
+        ec_i = header.index("EC_key")
+        start = index[b][1] if b >= 0 else (index[0][1] if index else len(mm))
+        for off, ln in iter_records(mm, start):
+            rec = mm[off:off + ln]
+            key = ec_key(split_record(rec)[ec_i])
+            if key < lo:
+                continue
+            if key > hi:
+                break
+            yield rec
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    s = sub.add_parser("sort", help="Write the export sorted by numeric EC, then accession")
+    s.add_argument("input_file", help="UniProt export (TSV)")
+    s.add_argument("--out", default=None, help="Output TSV (default: <stem>_ec_sorted.tsv next to input)")
+    s.add_argument("--ec-col", default="EC number", help='EC column (default: "EC number")')
+    s.add_argument("--cat-col", default="Catalytic activity",
+                   help='Fallback text column to extract EC from (default: "Catalytic activity")')
+    s.add_argument("--entry-col", default="Entry", help='Accession column (default: "Entry")')
+    s.add_argument("--mode", choices=["first", "explode"], default="first",
+                   help="'first' = sort a row under its lowest full EC; 'explode' = one copy per EC")
+    s.add_argument("--max-rows", type=int, default=100_000, help="Rows held in memory per sorted run (default: 100000)")
+    s.add_argument("--index-every", type=int, default=256, help="Rows per sparse index entry (default: 256)")
+    s.add_argument("--tmp-dir", default=None, help="Directory for spilled runs (default: system temp)")
+
+    r = sub.add_parser("range", help="Rows for an EC range (or one partial EC subtree) from a sorted file")
+    r.add_argument("sorted_file", help="File written by 'sort'")
+    r.add_argument("lo", help='First EC of the range, or a partial EC like "2.1.1.-" for its subtree')
+    r.add_argument("hi", nargs="?", default=None, help="Last EC of the range (inclusive)")
+    r.add_argument("--out", default=None, help="Output TSV (default: stdout)")
+    args = ap.parse_args()
+
+    if args.cmd == "sort":
+        in_path = Path(args.input_file)
+        out_path = Path(args.out) if args.out else in_path.with_name(f"{in_path.stem}_ec_sorted.tsv")
+        written, runs = external_sort(
+            in_path, out_path, args.ec_col, args.cat_col, args.entry_col, args.mode,
+            max(args.max_rows, 1), max(args.index_every, 1), args.tmp_dir,
+        )
+        print(f"Rows written: {written} (merged from {runs} sorted run(s))")
+        print(f"Wrote: {out_path.resolve()}")
+        print(f"Wrote index: {index_path_for(out_path).resolve()}")
+        return
+
+    sorted_path = Path(args.sorted_file)
+    try:
+        lo, hi = ec_range(args.lo, args.hi)
+    except ValueError as e:
+        raise SystemExit(f"ERROR: {e}")
+    with open(sorted_path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        h_off, h_len = next(iter_records(mm))
+        header = mm[h_off:h_off + h_len]
+    out = open(args.out, "wb") if args.out else sys.stdout.buffer
+    out.write(header)
+    eol = b"\r\n" if header.endswith(b"\r\n") else b"\n"
+    n = 0
+    for rec in read_range(sorted_path, lo, hi):
+        # the file's last record may lack a line end; don't glue it to what follows
+        out.write(rec if rec.endswith(b"\n") else rec + eol)
+        n += 1
+    if args.out:
+        out.close()
+        print(f"Rows written: {n}")
+        print(f"Wrote: {Path(args.out).resolve()}")
+    else:
+        out.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -71,9 +71,10 @@ def classify(name: str, status: str) -> str:
 
 
 def ec_sort_key(ec: str):
-    # numeric sort by EC parts
+    # numeric sort by EC parts; a "-" level (partial EC like 2.1.1.-) sorts before
+    # every number at that level, so the partial EC heads its own subtree
     try:
-        return [int(x) for x in ec.split(".")]
+        return [-1 if x == "-" else int(x) for x in ec.split(".")]
     except Exception:
         return [999, 999, 999, 999]
 
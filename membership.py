@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Sparse base-name x file / MT_group / EC membership matrix for cross-file overlap analysis.
+
+- Rows are interned base names ("DNM1B", "CMT3", ...), columns are input files (labelled by the
+  path as given on the command line), MT_groups or ECs, values are the number of entries with
+  that base name in that column.
+- Stored as CSR (indptr / indices / data numpy arrays) in one .npz together with the row and
+  column names; built by count_unique_entry_bases.py --matrix in the same pass that counts.
+- Queries are vectorized over the CSR arrays (no Python set loops):
+    overlap : base names shared by every pair of columns
+    jaccard : |A & B| / |A | B| for every pair of columns
+    unique  : base names found in exactly one column
+    shared  : base names found in at least N columns
+    where   : columns (and counts) of given base names
+
+Run:
+  python count_unique_entry_bases.py MT2_by_group/*.tsv --matrix MT2_bases.npz
+  python count_unique_entry_bases.py MT2.tsv --matrix MT2_bases_by_ec.npz --columns ec
+  python membership.py overlap MT2_bases.npz
+  python membership.py jaccard MT2_bases.npz
+  python membership.py unique MT2_bases.npz --column MT2_by_group/MT2_C_MT.tsv
+  python membership.py shared MT2_bases.npz --min 3
+  python membership.py where MT2_bases.npz DNM1B CMT3
+"""
+
+import argparse
+import re
+from pathlib import Path
+
+import numpy as np
+
+
+EC_REGEX = re.compile(r"\b\d+\.\d+\.\d+\.(?:\d+|-)\b")
+
+
+class MembershipBuilder:
+    """Accumulates (base name, column) occurrences as COO arrays, interning both sides."""
+
+    def __init__(self):
+        self.row_ids: dict[str, int] = {}
+        self.col_ids: dict[str, int] = {}
+        self._rows: list[np.ndarray] = []
+        self._cols: list[np.ndarray] = []
+
+    def add(self, bases: list[str], columns: list[str]) -> None:
+        """One occurrence per (bases[i], columns[i]) pair."""
+        rows = np.fromiter((self.row_ids.setdefault(b, len(self.row_ids)) for b in bases),
+                           dtype=np.int64, count=len(bases))
+        cols = np.fromiter((self.col_ids.setdefault(c, len(self.col_ids)) for c in columns),
+                           dtype=np.int64, count=len(columns))
+        self._rows.append(rows)
+        self._cols.append(cols)
+
+    def build(self) -> "Membership":
+        n_rows, n_cols = len(self.row_ids), len(self.col_ids)
+        rows = np.concatenate(self._rows) if self._rows else np.zeros(0, dtype=np.int64)
+        cols = np.concatenate(self._cols) if self._cols else np.zeros(0, dtype=np.int64)
+
+        # sum duplicate (row, col) pairs; np.unique also sorts by row, then column
+        flat, data = np.unique(rows * max(n_cols, 1) + cols, return_counts=True)
+        r = flat // max(n_cols, 1)
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(r, minlength=n_rows), out=indptr[1:])
+        return Membership(
+            indptr=indptr,
+            indices=(flat % max(n_cols, 1)).astype(np.int32),
+            data=data.astype(np.int32),
+            row_names=list(self.row_ids),
+            col_names=list(self.col_ids),
+        )
+
+
+class Membership:
+    """CSR membership matrix: base names (rows) x columns, values = entry counts."""
+
+    def __init__(self, indptr, indices, data, row_names: list[str], col_names: list[str]):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.row_names = list(row_names)
+        self.col_names = list(col_names)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.row_names), len(self.col_names)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    def save(self, path: Path) -> None:
+        np.savez(
+            path,
+            indptr=self.indptr, indices=self.indices, data=self.data,
+            row_names=np.asarray(self.row_names, dtype=str), col_names=np.asarray(self.col_names, dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "Membership":
+        with np.load(path) as z:
+            return cls(z["indptr"], z["indices"], z["data"], z["row_names"].tolist(), z["col_names"].tolist())
+
+    def row_degrees(self) -> np.ndarray:
+        """Number of columns each base name appears in."""
+        return np.diff(self.indptr)
+
+    def column_sizes(self) -> np.ndarray:
+        """Distinct base names per column."""
+        return np.bincount(self.indices, minlength=self.shape[1])
+
+    def overlap(self) -> np.ndarray:
+        """
+        k x k matrix of base names shared by each pair of columns (diagonal = column sizes),
+        i.e. B^T B for the binarized matrix B, computed by expanding every row's column pairs.
+        """
+        k = self.shape[1]
+        deg = self.row_degrees()
+        entry_row = np.repeat(np.arange(len(deg)), deg)
+        reps = deg[entry_row]                                  # pairs contributed by each entry
+        left = np.repeat(np.arange(self.nnz), reps)
+        # partner = row start + 0..deg-1 for every repeated entry
+        first = np.repeat(np.cumsum(reps) - reps, reps)
+        partner = self.indptr[entry_row[left]] + (np.arange(len(left)) - first)
+        pairs = self.indices[left].astype(np.int64) * k + self.indices[partner]
+        return np.bincount(pairs, minlength=k * k).reshape(k, k)
+
+    def jaccard(self) -> np.ndarray:
+        ov = self.overlap().astype(np.float64)
+        size = np.diag(ov)
+        union = size[:, None] + size[None, :] - ov
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(union > 0, ov / union, 0.0)
+
+    def unique_rows(self, column: int | None = None) -> np.ndarray:
+        """Rows found in exactly one column (optionally: only that column)."""
+        deg = self.row_degrees()
+        rows = np.flatnonzero(deg == 1)
+        if column is not None:
+            rows = rows[self.indices[self.indptr[rows]] == column]
+        return rows
+
+    def unique_counts(self) -> np.ndarray:
+        """Per column: number of base names found only there."""
+        rows = self.unique_rows()
+        return np.bincount(self.indices[self.indptr[rows]], minlength=self.shape[1])
+
+    def shared_rows(self, min_columns: int = 2) -> np.ndarray:
+        return np.flatnonzero(self.row_degrees() >= min_columns)
+
+    def row_entries(self, row: int) -> list[tuple[str, int]]:
+        a, b = self.indptr[row], self.indptr[row + 1]
+        return [(self.col_names[c], int(v)) for c, v in zip(self.indices[a:b].tolist(), self.data[a:b].tolist())]
+
+
+def column_labels(df, mode: str, file_label: str, group_col: str, ec_col: str) -> list[list[str]]:
+    """Column label(s) of every row of a table: its file, its MT_group, or each of its ECs."""
+    if mode == "file":
+        return [[file_label]] * len(df)
+    if mode == "group":
+        if group_col not in df:
+            raise SystemExit(f"ERROR: Column '{group_col}' not found in {file_label}. Columns: {df.columns}")
+        return [[g or "NO_GROUP"] for g in df[group_col]]
+    if ec_col not in df:
+        raise SystemExit(f"ERROR: Column '{ec_col}' not found in {file_label}. Columns: {df.columns}")
+    return [sorted(set(EC_REGEX.findall(s))) or ["NO_EC"] for s in df[ec_col]]
+
+
+def _column_index(m: Membership, name: str) -> int:
+    if name not in m.col_names:
+        raise SystemExit(f"ERROR: column '{name}' not in matrix. Columns: {m.col_names}")
+    return m.col_names.index(name)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name, help_text in [
+        ("overlap", "Shared base names for every pair of columns"),
+        ("jaccard", "Jaccard similarity for every pair of columns"),
+        ("unique", "Base names found in exactly one column"),
+        ("shared", "Base names found in several columns"),
+        ("where", "Columns (with entry counts) of the given base names"),
+    ]:
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("matrix", help=".npz written by count_unique_entry_bases.py --matrix")
+        if name == "unique":
+            p.add_argument("--column", default=None, help="List the base names unique to this column")
+        if name == "shared":
+            p.add_argument("--min", type=int, default=2, help="Minimum number of columns (default: 2)")
+        if name == "where":
+            p.add_argument("bases", nargs="+", help="Base names, e.g. DNM1B CMT3")
+    args = ap.parse_args()
+
+    m = Membership.load(Path(args.matrix))
+    cols = m.col_names
+
+    if args.cmd in ("overlap", "jaccard"):
+        mat = m.overlap() if args.cmd == "overlap" else m.jaccard()
+        print("\t".join(["column"] + cols))
+        for name, row in zip(cols, mat):
+            vals = [str(int(v)) for v in row] if args.cmd == "overlap" else [f"{v:.3f}" for v in row]
+            print("\t".join([name] + vals))
+    elif args.cmd == "unique":
+        if args.column is None:
+            print("column\tbase_names\tunique_to_column")
+            for name, size, uniq in zip(cols, m.column_sizes().tolist(), m.unique_counts().tolist()):
+                print(f"{name}\t{size}\t{uniq}")
+        else:
+            for r in m.unique_rows(_column_index(m, args.column)).tolist():
+                print(f"{m.row_names[r]}\t{int(m.data[m.indptr[r]])}")
+    elif args.cmd == "shared":
+        rows = m.shared_rows(args.min)
+        deg = m.row_degrees()
+        for r in rows[np.argsort(-deg[rows], kind="stable")].tolist():
+            print(f"{m.row_names[r]}\t{deg[r]}\t" + ", ".join(f"{c}:{v}" for c, v in m.row_entries(r)))
+    else:
+        index = {n: i for i, n in enumerate(m.row_names)}
+        for b in args.bases:
+            r = index.get(b)
+            entries = m.row_entries(r) if r is not None else []
+            print(f"{b}\t" + (", ".join(f"{c}:{v}" for c, v in entries) if entries else "NOT FOUND"))
+
+
+if __name__ == "__main__":
+    main()
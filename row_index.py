@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Build a sorted, memory-mappable accession -> row offset index for a UniProt TSV export,
+and pull rows out of the export by accession without loading it with pandas.
+
+- Records are found with a quote-aware scan following csv rules: a newline inside a quoted field
+  (e.g. a multi-line "Domain [FT]" value) does not end the record, while a quote inside an
+  unquoted field (weird 3" name) is a literal character, as for the csv module and pandas.
+- A record with more fields than the header (a sign of a broken quote) fails the build loudly.
+- Every record is keyed by its "Entry" and "Entry Name" values.
+- The index file (<tsv>.idx) holds fixed-width sorted keys, byte offsets and lengths;
+  lookups are a vectorized binary search over a memmap, rows are sliced from an mmap of the TSV.
+
+Run:
+  python row_index.py build MT2.tsv
+  python row_index.py get MT2.tsv B1Q3J6 DNM1B_ORYSJ
+  python row_index.py get MT2_MIXED.tsv --ids-file accessions.txt --out subset.tsv
+"""
+
+import argparse
+import csv
+import io
+import mmap
+import sys
+from pathlib import Path
+
+import numpy as np
+
+
+MAGIC = b"MTROWIX1"
+# magic, n_keys, key_width, header_len, tsv_size, tsv_mtime_ns
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("n", "<u8"), ("width", "<u8"),
+                         ("header_len", "<u8"), ("tsv_size", "<u8"), ("tsv_mtime_ns", "<u8")])
+KEY_COLS = ("Entry", "Entry Name")
+
+
+def default_index_path(tsv_path: Path) -> Path:
+    return tsv_path.with_name(tsv_path.name + ".idx")
+
+
+def iter_records(buf, start: int = 0, end: int | None = None, quote: bytes = b'"', sep: bytes = b"\t"):
+    """
+    Yield (offset, length) of every record in buf[start:end] (length includes the line terminator).
+
+    csv rules: a quote opens a quoted field only at the start of a field, and inside it ""
+    is an escaped quote, so quoted fields may contain separators and newlines. Any other
+    quote is a literal character, so outside a quoted field only <sep><quote> needs to be looked at.
+    """
+    end = len(buf) if end is None else end
+    q = quote[0]
+    opener = sep + quote
+    pos = start
+    while pos < end:
+        rec_start = pos
+        in_quotes = buf[pos] == q
+        i = pos + 1 if in_quotes else pos
+        while True:
+            nl = buf.find(b"\n", pos, end)
+            stop = end if nl == -1 else nl + 1
+            while True:
+                if in_quotes:
+                    j = buf.find(quote, i, stop)
+                    if j == -1:
+                        break
+                    if j + 1 < end and buf[j + 1] == q:
+                        i = j + 2  # "" inside a quoted field
+                    else:
+                        in_quotes = False
+                        i = j + 1
+                else:
+                    j = buf.find(opener, i, stop)
+                    if j == -1:
+                        break
+                    in_quotes = True
+                    i = j + 2
+            pos = i = stop
+            if not in_quotes or nl == -1:
+                break
+        yield rec_start, pos - rec_start
+
+
+def split_record(rec: bytes, sep: str = "\t") -> list[str]:
+    """Split one raw record into fields (csv rules only if the record is quoted)."""
+    text = rec.decode("utf-8", errors="replace").rstrip("\r\n")
+    if '"' not in text:
+        return text.split(sep)
+    return next(csv.reader(io.StringIO(text), delimiter=sep))
+
+
+def build_index(tsv_path: Path, index_path: Path | None = None, key_cols=KEY_COLS) -> Path:
+    """Scan the TSV once and write the sorted key -> (offset, length) index."""
+    index_path = index_path or default_index_path(tsv_path)
+    st = tsv_path.stat()
+
+    keys: list[bytes] = []
+    offsets: list[int] = []
+    lengths: list[int] = []
+
+    with open(tsv_path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        records = iter_records(mm)
+        try:
+            h_off, h_len = next(records)
+        except StopIteration:
+            raise RuntimeError(f"{tsv_path.name} is empty")
+        header = split_record(mm[h_off:h_off + h_len])
+        cols = [header.index(c) for c in key_cols if c in header]
+        if not cols:
+            raise RuntimeError(f"None of {list(key_cols)} found in {tsv_path.name}. Columns: {header}")
+        need = max(cols) + 1
+
+        for n_rec, (off, ln) in enumerate(records, start=2):
+            rec = mm[off:off + ln]
+            if rec.startswith(b'"') or b'\t"' in rec:  # a quoted field; other quotes are literal
+                if off + ln == len(mm):
+                    # only the last record can end inside an open quote (which swallowed the rest of the file)
+                    try:
+                        next(csv.reader(io.StringIO(rec.decode("utf-8", errors="replace"), newline=""),
+                                        delimiter="\t", strict=True))
+                    except csv.Error:
+                        raise RuntimeError(
+                            f"{tsv_path.name}: record {n_rec} (byte {off}) opens a quote that is never closed. "
+                            f"Fix the file before indexing it."
+                        )
+                fields = [f.encode("utf-8") for f in split_record(rec)]
+                n_fields = len(fields)
+            else:
+                fields = rec.split(b"\t", need)
+                n_fields = rec.count(b"\t") + 1
+            if n_fields > len(header):
+                raise RuntimeError(
+                    f"{tsv_path.name}: record {n_rec} (byte {off}) has {n_fields} fields, the header has "
+                    f"{len(header)}; a quote is probably not closed. Fix the file before indexing it."
+                )
+            for c in cols:
+                if c < len(fields):
+                    k = fields[c].strip()
+                    if k:
+                        keys.append(k)
+                        offsets.append(off)
+                        lengths.append(ln)
+
+    width = max((len(k) for k in keys), default=1)
+    key_arr = np.array(keys, dtype=f"S{width}")
+    order = np.argsort(key_arr, kind="stable")
+
+    head = np.zeros(1, dtype=HEADER_DTYPE)
+    head[0] = (MAGIC, len(keys), width, h_len, st.st_size, st.st_mtime_ns)
+    with open(index_path, "wb") as out:
+        out.write(head.tobytes())
+        out.write(key_arr[order].tobytes())
+        out.write(np.asarray(offsets, dtype="<u8")[order].tobytes())
+        out.write(np.asarray(lengths, dtype="<u4")[order].tobytes())
+    return index_path
+
+
+class RowIndex:
+    """Memory-mapped view of an index built by build_index()."""
+
+    def __init__(self, index_path: Path):
+        head = np.fromfile(index_path, dtype=HEADER_DTYPE, count=1)
+        if len(head) != 1 or head["magic"][0] != MAGIC:
+            raise RuntimeError(f"{index_path} is not a row index file")
+        n = int(head["n"][0])
+        width = int(head["width"][0])
+        self.header_len = int(head["header_len"][0])
+        self.tsv_size = int(head["tsv_size"][0])
+        self.tsv_mtime_ns = int(head["tsv_mtime_ns"][0])
+
+        pos = HEADER_DTYPE.itemsize
+        self.keys = np.memmap(index_path, dtype=f"S{width}", mode="r", offset=pos, shape=(n,)) if n else np.array([], dtype="S1")
+        pos += n * width
+        self.offsets = np.memmap(index_path, dtype="<u8", mode="r", offset=pos, shape=(n,)) if n else np.array([], dtype="<u8")
+        pos += n * 8
+        self.lengths = np.memmap(index_path, dtype="<u4", mode="r", offset=pos, shape=(n,)) if n else np.array([], dtype="<u4")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def is_stale(self, tsv_path: Path) -> bool:
+        st = tsv_path.stat()
+        return st.st_size != self.tsv_size or st.st_mtime_ns != self.tsv_mtime_ns
+
+    def lookup(self, ids: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Batch lookup of every row carrying each id (a key may occur in several rows).
+
+        Returns (counts, query, offsets, lengths): counts[i] = rows matched by ids[i] (0 = not found);
+        query/offsets/lengths hold one entry per matched row, grouped by id in query order,
+        rows of one id in file order.
+        """
+        q = np.array([s.encode("utf-8") for s in ids], dtype=self.keys.dtype if len(self.keys) else "S1")
+        if len(self.keys) == 0 or len(q) == 0:
+            return (np.zeros(len(q), dtype=np.int64), np.zeros(0, dtype=np.int64),
+                    np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint32))
+        # longer queries can't match and would be truncated by the fixed width
+        too_long = np.array([len(s.encode("utf-8")) > self.keys.dtype.itemsize for s in ids], dtype=bool)
+        left = np.searchsorted(self.keys, q, side="left")
+        right = np.searchsorted(self.keys, q, side="right")
+        counts = np.where(too_long, 0, right - left).astype(np.int64)
+        # positions left[i] .. right[i]-1 for every query, concatenated
+        query = np.repeat(np.arange(len(q)), counts)
+        pos = left[query] + (np.arange(len(query)) - np.repeat(np.cumsum(counts) - counts, counts))
+        return counts, query, self.offsets[pos].astype(np.uint64), self.lengths[pos].astype(np.uint32)
+
+
+def open_index(tsv_path: Path, index_path: Path | None = None, rebuild_stale: bool = True) -> RowIndex:
+    """Open the index for tsv_path, building (or rebuilding a stale) one if needed."""
+    index_path = index_path or default_index_path(tsv_path)
+    if not index_path.exists():
+        build_index(tsv_path, index_path)
+    idx = RowIndex(index_path)
+    if rebuild_stale and idx.is_stale(tsv_path):
+        build_index(tsv_path, index_path)
+        idx = RowIndex(index_path)
+    return idx
+
+
+def fetch_rows(tsv_path: Path, ids: list[str], index_path: Path | None = None,
+               unique: bool = True) -> tuple[bytes, list[bytes], list[str]]:
+    """
+    Return (header_bytes, row_bytes_in_query_order, missing_ids).
+
+    Every row carrying an id is returned (an Entry can occur in several rows), each ending in a line
+    terminator (the last record of a file may have none; it gets the header's).
+    With unique=True a row matched by several ids (e.g. its Entry and its Entry Name) is returned once.
+    """
+    idx = open_index(tsv_path, index_path)
+    counts, _query, offsets, lengths = idx.lookup(ids)
+    missing = [i for i, n in zip(ids, counts.tolist()) if n == 0]
+
+    rows = []
+    seen = set()
+    with open(tsv_path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header = mm[:idx.header_len]
+        eol = b"\r\n" if header.endswith(b"\r\n") else b"\n"
+        for off, ln in zip(offsets.tolist(), lengths.tolist()):
+            if unique:
+                if off in seen:
+                    continue
+                seen.add(off)
+            row = mm[off:off + ln]
+            rows.append(row if row.endswith(b"\n") else row + eol)
+    return header, rows, missing
+
+
+def read_ids_file(path: Path) -> list[str]:
+    return [ln.strip() for ln in path.read_text(encoding="utf-8", errors="replace").splitlines() if ln.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="Build <tsv>.idx")
+    b.add_argument("tsv", help="UniProt export (TSV), e.g. MT2.tsv")
+    b.add_argument("--index", default=None, help="Index path (default: <tsv>.idx)")
+
+    g = sub.add_parser("get", help="Print / write the rows for the given accessions or entry names")
+    g.add_argument("tsv", help="UniProt export (TSV)")
+    g.add_argument("ids", nargs="*", help="Entry or Entry Name values")
+    g.add_argument("--ids-file", default=None, help="File with one Entry / Entry Name per line")
+    g.add_argument("--index", default=None, help="Index path (default: <tsv>.idx, built if missing)")
+    g.add_argument("--out", default=None, help="Output TSV (default: stdout)")
+    g.add_argument("--no-header", action="store_true", help="Do not write the header row")
+    args = ap.parse_args()
+
+    tsv_path = Path(args.tsv)
+    index_path = Path(args.index) if args.index else None
+
+    if args.cmd == "build":
+        out = build_index(tsv_path, index_path)
+        print(f"Indexed keys: {len(RowIndex(out))}")
+        print(f"Wrote: {out.resolve()}")
+        return
+
+    ids = list(args.ids)
+    if args.ids_file:
+        ids += read_ids_file(Path(args.ids_file))
+    if not ids:
+        raise SystemExit("ERROR: no ids given (use positional ids or --ids-file)")
+
+    header, rows, missing = fetch_rows(tsv_path, ids, index_path)
+    chunks = ([] if args.no_header else [header]) + rows
+    if args.out:
+        with open(args.out, "wb") as out:
+            out.writelines(chunks)
+        print(f"Rows written: {len(rows)}")
+        print(f"Wrote: {Path(args.out).resolve()}")
+    else:
+        sys.stdout.buffer.writelines(chunks)
+        sys.stdout.flush()
+    if missing:
+        print(f"Not found ({len(missing)}): {' '.join(missing[:20])}{' ...' if len(missing) > 20 else ''}",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
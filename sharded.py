@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Byte-range sharded, multi-process splitting of one large TSV/CSV export.
+
+- The file is cut into byte ranges aligned to record boundaries. Quote parity at each cut is
+  known from per-range quote counts (computed in parallel), and a cut only moves forward to a
+  newline where the parity is even, so quoted fields holding separators or newlines
+  (e.g. "Domain [FT]") are never split.
+- Each shard is streamed, parsed and classified in its own worker process (memory per worker
+  does not grow with the shard size); its rows are written to per-key part files (row + key
+  column, same csv formatting as tsv_engine.write_rows).
+- Part files are concatenated in shard order, so every output keeps the input row order.
+  They add up to a second copy of the output, so they go to a temporary directory under
+  work_dir (the scripts default it to the output directory, or --tmp-dir).
+
+Used by split_mt2_by_group.py and MT_split_by_ec.py with --workers N.
+"""
+
+import csv
+import io
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from row_index import iter_records
+from tsv_engine import write_rows
+
+
+SHARD_BYTES = 256 * 1024 * 1024
+
+
+def parse_header(header_bytes: bytes, sep: str) -> list[str]:
+    return next(csv.reader(io.StringIO(header_bytes.decode("utf-8", errors="replace"), newline=""), delimiter=sep), [])
+
+
+def read_header(path: Path, sep: str) -> list[str]:
+    """Column names of a delimited file (first record only)."""
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        off, ln = next(iter_records(mm, sep=sep.encode()), (0, 0))
+        return parse_header(mm[off:off + ln], sep)
+
+
+class _RangeReader(io.RawIOBase):
+    """Raw binary reader over bytes [start, end) of a file, so a shard can be streamed."""
+
+    def __init__(self, path: str, start: int, end: int):
+        self._fh = open(path, "rb")
+        self._fh.seek(start)
+        self._left = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self._left <= 0:
+            return 0
+        n = self._fh.readinto(memoryview(b)[:min(len(b), self._left)])
+        self._left -= n
+        return n
+
+    def close(self) -> None:
+        self._fh.close()
+        super().close()
+
+
+def _count_quotes(args) -> int:
+    path, start, end = args
+    with _RangeReader(path, start, end) as raw:
+        n = 0
+        buf = bytearray(4 * 1024 * 1024)
+        while True:
+            k = raw.readinto(buf)
+            if not k:
+                return n
+            n += buf.count(b'"', 0, k)
+
+
+def shard_ranges(path: Path, pool: ProcessPoolExecutor, n_shards: int,
+                 sep: str = "\t") -> tuple[bytes, list[tuple[int, int]]]:
+    """Return (header record bytes, [(start, end), ...]) covering all data records of the file."""
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        h_off, h_len = next(iter_records(mm, sep=sep.encode()), (0, 0))
+        header = mm[h_off:h_off + h_len]
+        data_start = h_off + h_len
+        if data_start >= size:
+            return header, []
+
+        n_shards = max(1, min(n_shards, size - data_start))
+        cuts = [data_start + (size - data_start) * k // n_shards for k in range(n_shards + 1)]
+        counts = list(pool.map(_count_quotes, [(str(path), a, b) for a, b in zip(cuts, cuts[1:])]))
+
+        bounds = [data_start]
+        parity = 0
+        for k in range(1, n_shards):
+            parity = (parity + counts[k - 1]) % 2
+            pos, p = cuts[k], parity
+            # move the cut forward to the end of the record it falls in
+            while pos < size:
+                nl = mm.find(b"\n", pos)
+                stop = size if nl == -1 else nl + 1
+                p = (p + mm[pos:stop].count(b'"')) % 2
+                pos = stop
+                if p == 0:
+                    break
+            if pos > bounds[-1] and pos < size:
+                bounds.append(pos)
+        bounds.append(size)
+    return header, list(zip(bounds, bounds[1:]))
+
+
+def _process_shard(args):
+    """Parse one byte range, classify every row, write per-key part files. Returns (shard, counts, parts, rows)."""
+    shard, path, start, end, sep, n_cols, key_idx, classify, work_dir = args
+    csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+    writers = {}
+    handles = {}
+    parts = {}
+    counts = Counter()
+    n_rows = 0
+    # streamed through a bounded reader: memory per worker doesn't grow with the shard size
+    text = io.TextIOWrapper(io.BufferedReader(_RangeReader(path, start, end), 1024 * 1024),
+                            encoding="utf-8", errors="replace", newline="")
+    try:
+        for rec in csv.reader(text, delimiter=sep):
+            if not rec:
+                continue
+            if len(rec) < n_cols:
+                rec = rec + [""] * (n_cols - len(rec))
+            elif len(rec) > n_cols:
+                rec = rec[:n_cols]
+            n_rows += 1
+            for key in classify(rec):
+                w = writers.get(key)
+                if w is None:
+                    part = Path(work_dir) / f"{shard:06d}_{len(parts):06d}.part"
+                    parts[key] = str(part)
+                    handles[key] = open(part, "w", encoding="utf-8", newline="")
+                    w = writers[key] = csv.writer(handles[key], delimiter=sep, lineterminator=os.linesep)
+                if key_idx is None:
+                    w.writerow(rec + [key])
+                else:
+                    rec[key_idx] = key
+                    w.writerow(rec)
+                counts[key] += 1
+    finally:
+        text.close()
+        for h in handles.values():
+            h.close()
+    return shard, counts, parts, n_rows
+
+
+def split_sharded(path: Path, sep: str, classify, key_col: str, out_file_for_key, workers: int,
+                  write_empty_keys: list[str] | None = None, shard_bytes: int = SHARD_BYTES,
+                  work_dir: Path | None = None) -> tuple[list[str], Counter, dict[str, Path], int]:
+    """
+    Split `path` by the keys `classify(row) -> list[str]` returns, using `workers` processes.
+
+    classify must be picklable (a module-level function or functools.partial of one).
+    Writes out_file_for_key(key) for every key seen (plus write_empty_keys, header only).
+    Returns (output columns, rows per key in first-appearance order, key -> output file, input rows).
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    # no more than one shard per 4 KiB just to keep every worker busy; an explicit shard_bytes is honoured
+    n_shards = max(min(workers, size // 4096 + 1), -(-size // max(shard_bytes, 1)))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        header_bytes, ranges = shard_ranges(path, pool, n_shards, sep)
+        header = parse_header(header_bytes, sep)
+        # like Table.__setitem__: an existing key column is overwritten in place, otherwise appended
+        key_idx = header.index(key_col) if key_col in header else None
+        out_header = header if key_idx is not None else header + [key_col]
+
+        with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+            jobs = [(i, str(path), a, b, sep, len(header), key_idx, classify, tmp) for i, (a, b) in enumerate(ranges)]
+            results = sorted(pool.map(_process_shard, jobs), key=lambda r: r[0])
+
+            counts = Counter()
+            n_rows = 0
+            for _shard, c, _parts, n in results:
+                counts.update(c)
+                n_rows += n
+
+            out_files: dict[str, Path] = {}
+            for key in list(counts) + [k for k in (write_empty_keys or []) if k not in counts]:
+                out_file = out_file_for_key(key)
+                write_rows(out_file, out_header, [], sep=sep)
+                with open(out_file, "ab") as out:
+                    for _shard, _c, parts, _n in results:
+                        part = parts.get(key)
+                        if part:
+                            with open(part, "rb") as src:
+                                shutil.copyfileobj(src, out, 16 * 1024 * 1024)
+                out_files[key] = out_file
+    return out_header, counts, out_files, n_rows
@@ -19,18 +19,28 @@ Inputs:
 
 Outputs:
   - <out-dir>/MT2_O_MT.tsv, MT2_N_MT.tsv, ... plus MT2_UNKNOWN.tsv for unmapped ECs.
+  - optional (--domain-table): <out-dir>/MT2_domains/, a columnar table parsed from "Domain [FT]"
+    (see domain_table.py for per-group domain stats).
+  - optional (--taxdump): <out-dir>/MT2_group_<rank>_counts.tsv, rows per group and clade
+    (see taxonomy.py); with --clade-split also one file per group and clade in <out-dir>/MT2_by_<rank>/.
 
 Run:
   python split_mt2_by_group.py MT_grouped.tsv MT2.tsv
   python split_mt2_by_group.py MT_grouped.tsv MT2.tsv --ec-col "EC number" --out-dir MT2_split
+  python split_mt2_by_group.py MT_grouped.tsv MT2.tsv --domain-table
+  python split_mt2_by_group.py MT_grouped.tsv MT2.tsv --engine pyarrow
+  python split_mt2_by_group.py MT_grouped.tsv MT2.tsv --workers 8   # huge exports, one shard per core
+  python split_mt2_by_group.py MT_grouped.tsv MT2.tsv --taxdump /data/taxdump --rank kingdom --clade-split
 """
 
 import argparse
 import re
-from collections import defaultdict
+from collections import Counter, defaultdict
+from functools import partial
 from pathlib import Path
 
-import pandas as pd
+from tsv_engine import add_engine_arg, read_table, write_rows
+
 
 EC_REGEX = re.compile(r"\b\d+\.\d+\.\d+\.(?:\d+|-)\b")
 
@@ -68,7 +78,7 @@ def parse_grouped_table(path: Path) -> dict[str, str]:
     Parse MT_grouped.tsv as a normal table with columns.
     Tries to find columns that look like EC and group.
     """
-    df = pd.read_csv(path, sep="\t", dtype=str)
+    df = read_table(path, sep="\t", engine="stdlib")
 
     # guess EC column
     ec_candidates = [c for c in df.columns if c.strip().lower() in {"ec", "ec_number", "ec number"}]
@@ -76,7 +86,7 @@ def parse_grouped_table(path: Path) -> dict[str, str]:
         # fallback: any column containing "ec"
         ec_candidates = [c for c in df.columns if "ec" in c.strip().lower()]
     if not ec_candidates:
-        raise RuntimeError(f"Could not find an EC column in {path.name}. Columns: {list(df.columns)}")
+        raise RuntimeError(f"Could not find an EC column in {path.name}. Columns: {df.columns}")
     ec_col = ec_candidates[0]
 
     # guess group column
@@ -84,13 +94,13 @@ def parse_grouped_table(path: Path) -> dict[str, str]:
     if not group_candidates:
         group_candidates = [c for c in df.columns if "group" in c.strip().lower()]
     if not group_candidates:
-        raise RuntimeError(f"Could not find a group column in {path.name}. Columns: {list(df.columns)}")
+        raise RuntimeError(f"Could not find a group column in {path.name}. Columns: {df.columns}")
     group_col = group_candidates[0]
 
     ec_to_group = {}
-    for _, row in df.iterrows():
-        ec = str(row.get(ec_col, "")).strip()
-        group = str(row.get(group_col, "")).strip()
+    for ec, group in zip(df[ec_col], df[group_col]):
+        ec = ec.strip()
+        group = group.strip()
         if EC_REGEX.fullmatch(ec) and group:
             ec_to_group.setdefault(ec, group)
 
@@ -141,6 +151,11 @@ def decide_row_group(ec_list: list[str], ec_to_group: dict[str, str]) -> str:
     return "MULTIPLE"
 
 
+def classify_row(row: list[str], ec_idx: int, ec_to_group: dict[str, str]) -> list[str]:
+    """Group of one raw row (used by the sharded --workers path)."""
+    return [decide_row_group(EC_REGEX.findall(row[ec_idx]), ec_to_group)]
+
+
 def sanitize_filename(s: str) -> str:
     return re.sub(r"[^A-Za-z0-9._-]+", "_", s)
 
@@ -165,6 +180,46 @@ def main():
         action="store_true",
         help="Also write empty TSV files for groups that have 0 rows.",
     )
+    ap.add_argument(
+        "--domain-table",
+        action="store_true",
+        help='Also parse the "Domain [FT]" column into a binary domain table (<out-dir>/<MT2_stem>_domains/).',
+    )
+    ap.add_argument(
+        "--domain-col",
+        default="Domain [FT]",
+        help='Column with domain features, used with --domain-table (default: "Domain [FT]")',
+    )
+    ap.add_argument(
+        "--taxdump",
+        default=None,
+        help="Directory with NCBI nodes.dmp / names.dmp (enables clade rollups, see taxonomy.py)",
+    )
+    ap.add_argument("--rank", default="kingdom", help='Rank to roll up to with --taxdump (default: "kingdom")')
+    ap.add_argument(
+        "--clade",
+        action="append",
+        default=None,
+        help="Instead of --rank: use these clades (name or taxid; repeatable)",
+    )
+    ap.add_argument("--taxid-col", default="Organism (ID)", help='Taxid column (default: "Organism (ID)")')
+    ap.add_argument(
+        "--clade-split",
+        action="store_true",
+        help="With --taxdump: also write one TSV per group and clade.",
+    )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Split the input into byte-range shards processed by N worker processes (default: 1).",
+    )
+    ap.add_argument(
+        "--tmp-dir",
+        default=None,
+        help="With --workers: directory for the per-shard part files (default: the output directory).",
+    )
+    add_engine_arg(ap)
     args = ap.parse_args()
 
     key_path = Path(args.mt_grouped_tsv)
@@ -174,17 +229,6 @@ def main():
     if not ec_to_group:
         raise RuntimeError("Loaded 0 EC->group mappings from MT_grouped.tsv.")
 
-    df = pd.read_csv(mt2_path, sep="\t", dtype=str)
-
-    if args.ec_col not in df.columns:
-        raise RuntimeError(
-            f"Column '{args.ec_col}' not found in {mt2_path.name}. Available columns: {list(df.columns)}"
-        )
-
-    # Extract EC numbers from MT2 EC column (handles single EC, EC:..., multiple separated by | ; , etc.)
-    df["_ec_list"] = df[args.ec_col].fillna("").astype(str).apply(lambda s: EC_REGEX.findall(s))
-    df["MT_group"] = df["_ec_list"].apply(lambda ecs: decide_row_group(ecs, ec_to_group))
-
     out_dir = Path(args.out_dir) if args.out_dir else mt2_path.parent / f"{mt2_path.stem}_by_group"
     out_dir.mkdir(parents=True, exist_ok=True)
 
@@ -193,31 +237,117 @@ def main():
     special = ["MULTIPLE", "MIXED", "UNKNOWN", "NO_EC"]
     all_groups = key_groups + [g for g in special if g not in key_groups]
 
+    if args.workers > 1:
+        if args.domain_table or args.taxdump:
+            raise RuntimeError("--domain-table and --taxdump need the whole table in memory; run them without --workers.")
+        from sharded import read_header, split_sharded
+
+        columns = read_header(mt2_path, "\t")
+        if args.ec_col not in columns:
+            raise RuntimeError(
+                f"Column '{args.ec_col}' not found in {mt2_path.name}. Available columns: {columns}"
+            )
+        _, counts, out_files, n_rows = split_sharded(
+            mt2_path,
+            "\t",
+            partial(classify_row, ec_idx=columns.index(args.ec_col), ec_to_group=ec_to_group),
+            "MT_group",
+            lambda g: out_dir / f"{mt2_path.stem}_{sanitize_filename(g)}.tsv",
+            args.workers,
+            write_empty_keys=all_groups if args.write_empty else None,
+            work_dir=Path(args.tmp_dir) if args.tmp_dir else out_dir,
+        )
+        written = len(out_files)
+        summary = counts.most_common()
+        summary_file = out_dir / f"{mt2_path.stem}_group_counts.tsv"
+        write_rows(summary_file, ["MT_group", "rows"], summary, sep="\t")
+
+        print(f"Loaded EC->group mappings: {len(ec_to_group)}")
+        print(f"Input rows: {n_rows} ({args.workers} workers)")
+        print(f"Wrote {written} group files to: {out_dir.resolve()}")
+        print(f"Wrote summary: {summary_file.resolve()}")
+        return
+
+    df = read_table(mt2_path, sep="\t", engine=args.engine)
+
+    if args.ec_col not in df:
+        raise RuntimeError(
+            f"Column '{args.ec_col}' not found in {mt2_path.name}. Available columns: {df.columns}"
+        )
+
+    # Load the taxonomy and check --rank / --clade before any file is written
+    tax = None
+    if args.taxdump:
+        from taxonomy import check_clades, load_taxonomy
+
+        if args.taxid_col not in df:
+            raise RuntimeError(f"Column '{args.taxid_col}' not found in {mt2_path.name}. Available columns: {df.columns}")
+        tax = load_taxonomy(Path(args.taxdump))
+        check_clades(tax, args.rank, args.clade)
+
+    # Extract EC numbers from MT2 EC column (handles single EC, EC:..., multiple separated by | ; , etc.)
+    df["MT_group"] = [decide_row_group(EC_REGEX.findall(s), ec_to_group) for s in df[args.ec_col]]
+
+    rows_by_group: dict[str, list[int]] = defaultdict(list)
+    for i, g in enumerate(df["MT_group"]):
+        rows_by_group[g].append(i)
+
     # Write separate TSV per group
     written = 0
     for g in all_groups:
-        sub = df[df["MT_group"] == g].drop(columns=["_ec_list"], errors="ignore")
-        if len(sub) == 0 and not args.write_empty:
+        idx = rows_by_group.get(g, [])
+        if len(idx) == 0 and not args.write_empty:
             continue
         out_file = out_dir / f"{mt2_path.stem}_{sanitize_filename(g)}.tsv"
-        sub.to_csv(out_file, sep="\t", index=False)
+        df.take(idx).write(out_file, sep="\t")
         written += 1
 
     # Save a quick summary
-    summary = (
-        df["MT_group"]
-        .value_counts(dropna=False)
-        .rename_axis("MT_group")
-        .reset_index(name="rows")
-        .sort_values("rows", ascending=False)
-    )
+    summary = Counter(df["MT_group"]).most_common()
     summary_file = out_dir / f"{mt2_path.stem}_group_counts.tsv"
-    summary.to_csv(summary_file, sep="\t", index=False)
+    write_rows(summary_file, ["MT_group", "rows"], summary, sep="\t")
+
+    # Optional: columnar domain table for fast per-group domain stats
+    domain_dir = None
+    if args.domain_table:
+        from domain_table import build_from_table, save_domain_table
+
+        table = build_from_table(df, domain_col=args.domain_col, group_col="MT_group")
+        domain_dir = out_dir / f"{mt2_path.stem}_domains"
+        save_domain_table(table, domain_dir)
+
+    # Optional: rows per group and clade (NCBI taxonomy)
+    clade_file = None
+    if tax is not None:
+        from taxonomy import clade_labels
+
+        clades = clade_labels(tax, df[args.taxid_col], args.rank, args.clade)
+        level = sanitize_filename(args.rank if not args.clade else "clade")
+
+        rows_by_clade: dict[tuple[str, str], list[int]] = defaultdict(list)
+        for i, (g, c) in enumerate(zip(df["MT_group"], clades)):
+            rows_by_clade[(g, c)].append(i)
+        group_order = {g: i for i, g in enumerate(all_groups)}
+        keys = sorted(rows_by_clade, key=lambda k: (group_order.get(k[0], len(all_groups)), -len(rows_by_clade[k]), k[1]))
+
+        clade_file = out_dir / f"{mt2_path.stem}_group_{level}_counts.tsv"
+        write_rows(clade_file, ["MT_group", level, "rows"], [[g, c, len(rows_by_clade[(g, c)])] for g, c in keys], sep="\t")
+
+        if args.clade_split:
+            clade_dir = out_dir / f"{mt2_path.stem}_by_{level}"
+            clade_dir.mkdir(parents=True, exist_ok=True)
+            for g, c in keys:
+                out_file = clade_dir / f"{mt2_path.stem}_{sanitize_filename(g)}_{sanitize_filename(c)}.tsv"
+                df.take(rows_by_clade[(g, c)]).write(out_file, sep="\t")
 
     print(f"Loaded EC->group mappings: {len(ec_to_group)}")
     print(f"Input rows: {len(df)}")
     print(f"Wrote {written} group files to: {out_dir.resolve()}")
     print(f"Wrote summary: {summary_file.resolve()}")
+    if domain_dir is not None:
+        print(f"Wrote domain table ({len(table)} domains): {domain_dir.resolve()}")
+    if clade_file is not None:
+        print(f"Wrote clade counts: {clade_file.resolve()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Taxonomy rollups from a local NCBI taxdump (nodes.dmp / names.dmp, optional merged.dmp).
+
+- The tree is stored as flat numpy arrays (sorted taxids, parent index, rank ID) with
+  pre-order interval numbering: node a is an ancestor of x  <=>  tin[a] <= tin[x] <= tout[a],
+  so clade membership of every row is one vectorized comparison.
+- The parsed tree is cached next to the dump (taxonomy_cache.npz) and rebuilt when a .dmp file is newer.
+- Rolling rows up to a rank (e.g. "kingdom") is one searchsorted over that rank's intervals.
+
+Get the dump from https://ftp.ncbi.nlm.nih.gov/pub/taxonomy/taxdump.tar.gz and unpack it.
+
+Run:
+  python taxonomy.py lineage /data/taxdump 39947
+  python taxonomy.py count /data/taxdump MT2_N_MT.tsv MT2_C_MT.tsv --rank kingdom
+  python taxonomy.py count /data/taxdump MT2_N_MT.tsv --clade Fungi --clade Metazoa
+
+split_mt2_by_group.py and count_unique_entry_bases.py accept --taxdump / --rank as well.
+"""
+
+import argparse
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from tsv_engine import add_engine_arg, read_table
+
+
+CACHE_NAME = "taxonomy_cache.npz"
+TAXID_COL = "Organism (ID)"
+
+
+def _read_dmp(path: Path, ncols: int):
+    """Yield the first ncols fields of each line of an NCBI .dmp file ("\\t|\\t" separated)."""
+    with open(path, "r", encoding="utf-8", errors="replace") as fh:
+        for line in fh:
+            line = line.rstrip("\r\n")
+            if line.endswith("\t|"):
+                line = line[:-2]
+            yield line.split("\t|\t", ncols)[:ncols]
+
+
+class Taxonomy:
+    """Array-based NCBI taxonomy tree with interval numbering for O(1) ancestor tests."""
+
+    def __init__(self, taxid, parent, rank, tin, tout, ranks, name_blob, name_off, merged_old, merged_new):
+        self.taxid = taxid          # int32, sorted
+        self.parent = parent        # int32, index of parent node (root points to itself)
+        self.rank = rank            # int16, index into self.ranks
+        self.tin = tin              # int32, pre-order number
+        self.tout = tout            # int32, largest pre-order number in the subtree
+        self.ranks = list(ranks)
+        self.name_blob = name_blob  # uint8, utf-8 scientific names concatenated
+        self.name_off = name_off    # int64, len(taxid) + 1 offsets into name_blob
+        self.merged_old = merged_old
+        self.merged_new = merged_new
+        self._name_index = None
+
+    def __len__(self) -> int:
+        return len(self.taxid)
+
+    # --- building / caching ---
+
+    @classmethod
+    def from_dump(cls, dump_dir: Path) -> "Taxonomy":
+        ids, parents, rank_names = [], [], []
+        for tid, par, rank in _read_dmp(dump_dir / "nodes.dmp", 3):
+            ids.append(int(tid))
+            parents.append(int(par))
+            rank_names.append(rank)
+
+        ids_arr = np.asarray(ids, dtype=np.int32)
+        order = np.argsort(ids_arr, kind="stable")
+        taxid = ids_arr[order]
+        parent = np.searchsorted(taxid, np.asarray(parents, dtype=np.int32)[order]).astype(np.int32)
+
+        ranks = sorted(set(rank_names))
+        rank_idx = {r: i for i, r in enumerate(ranks)}
+        rank = np.asarray([rank_idx[r] for r in rank_names], dtype=np.int16)[order]
+
+        tin, tout = cls._number_tree(parent)
+
+        sci_ids, sci_names = [], []
+        for tid, name, _unique, name_class in _read_dmp(dump_dir / "names.dmp", 4):
+            if name_class == "scientific name":
+                sci_ids.append(int(tid))
+                sci_names.append(name)
+        names = [""] * len(taxid)
+        taxid_l = taxid.tolist()
+        pos = np.searchsorted(taxid, np.asarray(sci_ids, dtype=np.int32)).tolist()
+        for i, tid, name in zip(pos, sci_ids, sci_names):
+            if i < len(taxid_l) and taxid_l[i] == tid:
+                names[i] = name
+        encoded = [n.encode("utf-8") for n in names]
+        name_off = np.zeros(len(encoded) + 1, dtype=np.int64)
+        name_off[1:] = np.cumsum([len(b) for b in encoded])
+        name_blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        old, new = [], []
+        merged = dump_dir / "merged.dmp"
+        if merged.exists():
+            for o, n in _read_dmp(merged, 2):
+                old.append(int(o))
+                new.append(int(n))
+        m_order = np.argsort(np.asarray(old, dtype=np.int32), kind="stable")
+        merged_old = np.asarray(old, dtype=np.int32)[m_order]
+        merged_new = np.asarray(new, dtype=np.int32)[m_order]
+
+        return cls(taxid, parent, rank, tin, tout, ranks, name_blob, name_off, merged_old, merged_new)
+
+    @staticmethod
+    def _number_tree(parent: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Pre-order (tin) and subtree-end (tout) numbers via an iterative DFS over a CSR child list."""
+        n = len(parent)
+        idx = np.arange(n, dtype=np.int32)
+        is_root = parent == idx
+        child_nodes = idx[~is_root]
+        child_parents = parent[~is_root]
+        order = np.argsort(child_parents, kind="stable")
+        children = child_nodes[order]
+        starts = np.searchsorted(child_parents[order], idx)
+        ends = np.searchsorted(child_parents[order], idx, side="right")
+
+        tin = np.full(n, -1, dtype=np.int32)
+        tout = np.full(n, -1, dtype=np.int32)
+        counter = 0
+        starts_l, ends_l, children_l = starts.tolist(), ends.tolist(), children.tolist()
+        for root in idx[is_root].tolist():
+            stack = [(root, False)]
+            while stack:
+                node, done = stack.pop()
+                if done:
+                    tout[node] = counter - 1
+                    continue
+                tin[node] = counter
+                counter += 1
+                stack.append((node, True))
+                stack.extend((c, False) for c in reversed(children_l[starts_l[node]:ends_l[node]]))
+        return tin, tout
+
+    def save(self, path: Path) -> None:
+        np.savez(
+            path,
+            taxid=self.taxid, parent=self.parent, rank=self.rank, tin=self.tin, tout=self.tout,
+            ranks=np.asarray(self.ranks, dtype=str), name_blob=self.name_blob, name_off=self.name_off,
+            merged_old=self.merged_old, merged_new=self.merged_new,
+        )
+
+    @classmethod
+    def load_cache(cls, path: Path) -> "Taxonomy":
+        with np.load(path) as z:
+            return cls(
+                z["taxid"], z["parent"], z["rank"], z["tin"], z["tout"], z["ranks"].tolist(),
+                z["name_blob"], z["name_off"], z["merged_old"], z["merged_new"],
+            )
+
+    # --- lookups ---
+
+    def name(self, i: int) -> str:
+        return bytes(self.name_blob[self.name_off[i]:self.name_off[i + 1]]).decode("utf-8")
+
+    def rank_name(self, i: int) -> str:
+        return self.ranks[int(self.rank[i])]
+
+    def index_of(self, taxids) -> np.ndarray:
+        """Node indices for an array of taxids (merged taxids are followed; -1 if unknown)."""
+        q = np.asarray(taxids, dtype=np.int64)
+        if len(self.merged_old):
+            m = np.searchsorted(self.merged_old, q)
+            m_c = np.minimum(m, len(self.merged_old) - 1)
+            hit = self.merged_old[m_c] == q
+            q = np.where(hit, self.merged_new[m_c], q)
+        pos = np.searchsorted(self.taxid, q)
+        pos_c = np.minimum(pos, len(self.taxid) - 1)
+        return np.where(self.taxid[pos_c] == q, pos_c, -1).astype(np.int32)
+
+    def find(self, clade: str) -> int:
+        """Node index for a taxid ("4751") or scientific name ("Fungi")."""
+        if clade.isdigit():
+            i = int(self.index_of([int(clade)])[0])
+        else:
+            if self._name_index is None:
+                self._name_index = {}
+                for j in range(len(self.taxid)):
+                    self._name_index.setdefault(self.name(j), j)
+            i = self._name_index.get(clade, -1)
+        if i < 0:
+            raise KeyError(f"Clade '{clade}' not found in taxonomy")
+        return i
+
+    def lineage(self, i: int) -> list[int]:
+        out = [i]
+        while self.parent[out[-1]] != out[-1]:
+            out.append(int(self.parent[out[-1]]))
+        return out[::-1]
+
+    def in_clade(self, nodes: np.ndarray, clade: int) -> np.ndarray:
+        """Boolean mask: node lies in the subtree of `clade` (unknown nodes (-1) are False)."""
+        t = self.tin[np.maximum(nodes, 0)]
+        return (nodes >= 0) & (self.tin[clade] <= t) & (t <= self.tout[clade])
+
+    def rollup(self, nodes: np.ndarray, rank: str) -> np.ndarray:
+        """
+        Nearest ancestor (or self) at `rank` for every node, -1 if none / unknown node.
+
+        Intervals of the rank's nodes are sorted by tin; each node takes the last interval
+        starting at or before it and, if that interval does not contain it (nested same-rank
+        clades), climbs to the enclosing same-rank interval.
+        """
+        if rank not in self.ranks:
+            raise KeyError(f"Rank '{rank}' not in taxonomy. Ranks: {self.ranks}")
+        cand = np.flatnonzero(self.rank == self.ranks.index(rank))
+        cand = cand[np.argsort(self.tin[cand])]
+        c_tin, c_tout = self.tin[cand], self.tout[cand]
+
+        # enclosing same-rank interval of each candidate (-1 if none)
+        enclosing = np.full(len(cand), -1, dtype=np.int64)
+        stack: list[int] = []
+        for k in range(len(cand)):
+            while stack and c_tout[stack[-1]] < c_tin[k]:
+                stack.pop()
+            if stack:
+                enclosing[k] = stack[-1]
+            stack.append(k)
+
+        t = self.tin[np.maximum(nodes, 0)]
+        k = np.searchsorted(c_tin, t, side="right") - 1
+        k[nodes < 0] = -1
+        while True:
+            bad = (k >= 0) & (c_tout[np.maximum(k, 0)] < t)
+            if not bad.any():
+                break
+            k[bad] = enclosing[k[bad]]
+        return np.where(k >= 0, cand[np.maximum(k, 0)], -1).astype(np.int32)
+
+
+def load_taxonomy(dump_dir: Path) -> Taxonomy:
+    """Load the cached tree, (re)building it from the .dmp files when missing or stale."""
+    dump_dir = Path(dump_dir)
+    cache = dump_dir / CACHE_NAME
+    dmps = [p for p in (dump_dir / "nodes.dmp", dump_dir / "names.dmp", dump_dir / "merged.dmp") if p.exists()]
+    if cache.exists() and all(p.stat().st_mtime <= cache.stat().st_mtime for p in dmps):
+        return Taxonomy.load_cache(cache)
+    tax = Taxonomy.from_dump(dump_dir)
+    try:
+        tax.save(cache)
+    except OSError:
+        pass  # read-only dump directory: just don't cache
+    return tax
+
+
+def check_clades(tax: Taxonomy, rank: str | None = None, clades: list[str] | None = None) -> None:
+    """Raise RuntimeError for an unknown rank or clade, before any work is done with them."""
+    if clades:
+        missing = []
+        for c in clades:
+            try:
+                tax.find(c)
+            except KeyError:
+                missing.append(c)
+        if missing:
+            raise RuntimeError(f"Clade(s) not found in taxonomy: {', '.join(missing)}")
+    elif rank not in tax.ranks:
+        raise RuntimeError(f"Rank '{rank}' not in taxonomy. Ranks: {tax.ranks}")
+
+
+def taxid_array(values: list[str]) -> np.ndarray:
+    """Organism (ID) strings -> int64 taxids (-1 where empty / not a number)."""
+    return np.asarray([int(v) if v.strip().isdigit() else -1 for v in values], dtype=np.int64)
+
+
+def clade_labels(tax: Taxonomy, taxid_values: list[str], rank: str | None = None,
+                 clades: list[str] | None = None) -> list[str]:
+    """
+    One clade label per row: the row's ancestor at `rank`, or the first of `clades` containing it.
+    Rows outside every clade get "UNCLASSIFIED".
+    """
+    nodes = tax.index_of(taxid_array(taxid_values))
+    labels = np.full(len(nodes), -1, dtype=np.int32)
+    if clades:
+        for c in clades:
+            ci = tax.find(c)
+            labels = np.where((labels < 0) & tax.in_clade(nodes, ci), ci, labels)
+    else:
+        labels = tax.rollup(nodes, rank)
+    names = {int(i): tax.name(int(i)) for i in np.unique(labels) if i >= 0}
+    return [names.get(i, "UNCLASSIFIED") for i in labels.tolist()]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    ln = sub.add_parser("lineage", help="Print the lineage of taxids")
+    ln.add_argument("taxdump", help="Directory with nodes.dmp / names.dmp")
+    ln.add_argument("taxids", nargs="+", type=int)
+
+    c = sub.add_parser("count", help="Rows per clade in one or more TSV files")
+    c.add_argument("taxdump", help="Directory with nodes.dmp / names.dmp")
+    c.add_argument("files", nargs="+", help="TSV files with an Organism (ID) column")
+    c.add_argument("--rank", default="kingdom", help='Rank to roll up to (default: "kingdom")')
+    c.add_argument("--clade", action="append", default=None, help="Count only these clades (repeatable)")
+    c.add_argument("--taxid-col", default=TAXID_COL, help=f'Taxid column (default: "{TAXID_COL}")')
+    add_engine_arg(c)
+    args = ap.parse_args()
+
+    tax = load_taxonomy(Path(args.taxdump))
+
+    if args.cmd == "count":
+        try:
+            check_clades(tax, args.rank, args.clade)
+        except RuntimeError as e:
+            raise SystemExit(f"ERROR: {e}")
+
+    if args.cmd == "lineage":
+        for i, node in zip(args.taxids, tax.index_of(args.taxids).tolist()):
+            if node < 0:
+                print(f"{i}\tNOT FOUND")
+                continue
+            print(f"{i}\t" + "; ".join(f"{tax.name(j)} ({tax.rank_name(j)})" for j in tax.lineage(node)))
+        return
+
+    label_col = args.rank if not args.clade else "clade"
+    print(f"file\t{label_col}\trows")
+    for f in args.files:
+        path = Path(f)
+        df = read_table(path, sep="\t", engine=args.engine)
+        if args.taxid_col not in df:
+            raise SystemExit(f"ERROR: Column '{args.taxid_col}' not found in {path.name}. Columns: {df.columns}")
+        counts = Counter(clade_labels(tax, df[args.taxid_col], args.rank, args.clade))
+        for label, n in counts.most_common():
+            print(f"{path.name}\t{label}\t{n}")
+
+
+if __name__ == "__main__":
+    main()
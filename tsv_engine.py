@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Shared table reading / writing for the scripts, with a selectable parsing backend.
+
+Engines (all imports are lazy, so a small run never pays for pandas / pyarrow):
+  - stdlib  : csv module, no third-party imports (fastest startup)
+  - pandas  : pandas C parser
+  - pyarrow : pyarrow's multithreaded CSV reader
+  - auto    : stdlib for files below AUTO_SMALL_BYTES, otherwise pyarrow (or pandas, or stdlib,
+              whichever is installed)
+
+Every engine returns the same Table: all values are strings, empty fields are "" (no NA
+conversion, short rows padded with ""), so scripts produce identical output files whichever engine
+parsed the input. pyarrow rejects short rows, so such a file is re-read with the stdlib engine.
+
+Benchmark (startup in a fresh interpreter + read throughput per engine, and an equality check on
+the given files and on a built-in sample with a short row):
+  python tsv_engine.py bench MT2.tsv
+  python tsv_engine.py bench MT2_EC_summary.tsv MT2_MIXED.tsv --engines stdlib pyarrow --repeat 5
+"""
+
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+ENGINES = ["stdlib", "pandas", "pyarrow", "auto"]
+AUTO_SMALL_BYTES = 8 * 1024 * 1024
+
+# Domain [FT] / Function [CC] values can be far above the csv module's default limit
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+
+class Table:
+    """Column-oriented table of strings (column name -> list of values)."""
+
+    def __init__(self, columns: list[str], data: dict[str, list[str]] | None = None):
+        self.columns = list(columns)
+        self.data = data if data is not None else {c: [] for c in self.columns}
+
+    def __len__(self) -> int:
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def __contains__(self, col: str) -> bool:
+        return col in self.data
+
+    def __getitem__(self, col: str) -> list[str]:
+        return self.data[col]
+
+    def __setitem__(self, col: str, values: list[str]) -> None:
+        if col not in self.data:
+            self.columns.append(col)
+        self.data[col] = list(values)
+
+    def drop(self, cols) -> "Table":
+        keep = [c for c in self.columns if c not in set(cols)]
+        return Table(keep, {c: self.data[c] for c in keep})
+
+    def take(self, indices: list[int]) -> "Table":
+        """New table with the given rows, in the given order."""
+        return Table(self.columns, {c: [self.data[c][i] for i in indices] for c in self.columns})
+
+    def rows(self):
+        return zip(*(self.data[c] for c in self.columns))
+
+    def write(self, path: Path, sep: str = "\t") -> None:
+        write_rows(path, self.columns, self.rows(), sep=sep)
+
+
+def write_rows(path: Path, header: list[str], rows, sep: str = "\t") -> None:
+    """Write a delimited file the way pandas' to_csv(index=False) does (minimal quoting, os.linesep)."""
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        w = csv.writer(fh, delimiter=sep, lineterminator=os.linesep, quoting=csv.QUOTE_MINIMAL)
+        w.writerow(header)
+        w.writerows(rows)
+
+
+def add_engine_arg(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="auto",
+        help="Parsing backend (default: auto = stdlib for small files, pyarrow/pandas for large ones)",
+    )
+
+
+def _installed(module: str) -> bool:
+    import importlib.util
+
+    return importlib.util.find_spec(module) is not None
+
+
+def resolve_engine(engine: str, path: Path | None = None) -> str:
+    """Map 'auto' to a concrete engine for this file."""
+    if engine != "auto":
+        return engine
+    size = path.stat().st_size if path is not None and path.exists() else 0
+    if size < AUTO_SMALL_BYTES:
+        return "stdlib"
+    for name in ("pyarrow", "pandas"):
+        if _installed(name):
+            return name
+    return "stdlib"
+
+
+def _read_stdlib(path: Path, sep: str) -> Table:
+    with open(path, "r", encoding="utf-8", errors="replace", newline="") as fh:
+        reader = csv.reader(fh, delimiter=sep)
+        header = next(reader, [])
+        n = len(header)
+        cols = [[] for _ in range(n)]
+        for rec in reader:
+            if not rec:
+                continue
+            if len(rec) < n:
+                rec = rec + [""] * (n - len(rec))
+            for col, v in zip(cols, rec):
+                col.append(v)
+    return Table(header, dict(zip(header, cols)))
+
+
+def _read_pandas(path: Path, sep: str) -> Table:
+    import pandas as pd
+
+    df = pd.read_csv(path, sep=sep, dtype=str, keep_default_na=False, na_filter=False, engine="c")
+    return Table(list(df.columns), {c: df[c].tolist() for c in df.columns})
+
+
+def _read_pyarrow(path: Path, sep: str) -> Table:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+
+    with open(path, "r", encoding="utf-8", errors="replace", newline="") as fh:
+        header = next(csv.reader(fh, delimiter=sep), [])
+    try:
+        table = pacsv.read_csv(
+            path,
+            read_options=pacsv.ReadOptions(use_threads=True, block_size=16 * 1024 * 1024),
+            parse_options=pacsv.ParseOptions(delimiter=sep, newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(
+                column_types={c: pa.string() for c in header},
+                strings_can_be_null=False,
+                quoted_strings_can_be_null=False,
+            ),
+        )
+    except pa.ArrowInvalid as e:
+        # pyarrow rejects short (truncated) rows; stdlib / pandas pad them with "", so re-read that way
+        print(f"WARNING: pyarrow could not parse {path.name} ({e}); re-reading with stdlib", file=sys.stderr)
+        return _read_stdlib(path, sep)
+    return Table(header, {c: table.column(c).to_pylist() for c in header})
+
+
+READERS = {"stdlib": _read_stdlib, "pandas": _read_pandas, "pyarrow": _read_pyarrow}
+
+
+def read_table(path: Path, sep: str = "\t", engine: str = "auto") -> Table:
+    """Read a delimited file into a Table of strings with the chosen engine."""
+    path = Path(path)
+    return READERS[resolve_engine(engine, path)](path, sep)
+
+
+# header, a full row, a short row, a quoted multi-line value: every engine must return the same table
+RAGGED_SAMPLE = 'Entry\tEntry Name\tEC number\r\nA1\tX_A\t2.1.1.37\r\nA2\tX_B\r\n"A\n3"\tX_C\t\r\n'
+
+
+def _bench_startup(engine: str) -> float:
+    """Seconds for a fresh interpreter to import this module and the engine's dependencies."""
+    mod = {"stdlib": "csv", "pandas": "pandas", "pyarrow": "pyarrow.csv"}[engine]
+    code = f"import tsv_engine, {mod}"
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=Path(__file__).resolve().parent)
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("bench", help="Startup + throughput per engine, and check outputs are identical")
+    b.add_argument("files", nargs="+", help="TSV files to read")
+    b.add_argument("--engines", nargs="+", choices=ENGINES[:-1], default=ENGINES[:-1])
+    b.add_argument("--repeat", type=int, default=3, help="Reads per file and engine (best is reported)")
+    b.add_argument("--sep", default="\t")
+    args = ap.parse_args()
+
+    engines = [e for e in args.engines if e == "stdlib" or _installed(e)]
+    skipped = [e for e in args.engines if e not in engines]
+    if skipped:
+        print(f"Not installed, skipped: {', '.join(skipped)}")
+
+    print("engine\tstartup_s")
+    for e in engines:
+        print(f"{e}\t{_bench_startup(e):.3f}")
+
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        ragged = Path(tmp) / "ragged_sample.tsv"
+        ragged.write_bytes(RAGGED_SAMPLE.replace("\t", args.sep).encode("utf-8"))
+        tables = {e: READERS[e](ragged, args.sep) for e in engines}
+    for e in engines[1:]:
+        if tables[e].columns != tables[engines[0]].columns or tables[e].data != tables[engines[0]].data:
+            mismatches += 1
+            print(f"  MISMATCH: {e} differs from {engines[0]} on a file with a short row")
+
+    print("\nfile\tMB\tengine\trows\tbest_s\tMB/s\tauto")
+    for f in args.files:
+        path = Path(f)
+        mb = path.stat().st_size / 1e6
+        ref = None
+        for e in engines:
+            best = float("inf")
+            for _ in range(max(args.repeat, 1)):
+                t0 = time.perf_counter()
+                t = READERS[e](path, args.sep)
+                best = min(best, time.perf_counter() - t0)
+            auto = "*" if resolve_engine("auto", path) == e else ""
+            print(f"{path.name}\t{mb:.2f}\t{e}\t{len(t)}\t{best:.4f}\t{mb / best:.1f}\t{auto}")
+            if ref is None:
+                ref = t
+            elif t.columns != ref.columns or t.data != ref.data:
+                mismatches += 1
+                print(f"  MISMATCH: {e} differs from {engines[0]} on {path.name}")
+
+    if mismatches:
+        raise SystemExit(f"ERROR: {mismatches} engine output mismatch(es)")
+    print("\nAll engines produced identical tables.")
+
+
+if __name__ == "__main__":
+    main()